@@ -0,0 +1,10 @@
+"""
+Pre-fork production server for this app (see chatbot_common/serve.py).
+
+    python serve.py --workers 4 --port 5000 --max-requests 2000
+"""
+from app import bot
+from chatbot_common import serve # app.py puts src/ on sys.path
+
+if __name__ == '__main__':
+    serve.main(bot)
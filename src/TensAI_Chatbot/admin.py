@@ -1,11 +1,18 @@
+import os
+import sys
+import datetime
 import streamlit as st
 import sqlite3
 import pandas as pd
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chatbot_common import leadstore # noqa: E402
+
 # -------------------------------
 # SQLite Connection
 # -------------------------------
 DB_PATH = "user_conversations.db"
+EXPORTS_FOLDER = "exports"
 
 def run_query(query, params=()):
     conn = sqlite3.connect(DB_PATH)
@@ -60,11 +67,13 @@ if st.button("🔄 Refresh Data"):
 # -------------------------------
 # Dashboard Tabs
 # -------------------------------
-tab1, tab2, tab3 = st.tabs(["👤 Users", "💬 Conversations", "🗑 Delete"])
+tab1, tab2, tab3, tab4 = st.tabs(["👤 Users", "💬 Conversations", "🗑 Delete", "📇 Leads"])
 
 with tab1:
     st.subheader("Registered Users")
     users_df = run_query("SELECT * FROM users ORDER BY created_at DESC")
+    if "llm_calls_avoided" in users_df.columns and len(users_df):
+        st.metric("LLM calls avoided per session", f"{users_df['llm_calls_avoided'].fillna(0).mean():.1f}")
     st.dataframe(users_df, use_container_width=True)
 
 with tab2:
@@ -136,4 +145,23 @@ with tab3:
             else:
                 st.warning("⚠ Please enter a valid username.")
 
-
+with tab4:
+    st.subheader("Leads")
+    conn = sqlite3.connect(DB_PATH)
+    leadstore.init_schema(conn.cursor())
+    conn.commit()
+    conn.close()
+    st.metric("Unique leads", int(run_query("SELECT COUNT(*) AS n FROM leads")["n"][0]))
+    st.dataframe(run_query("SELECT * FROM leads ORDER BY last_seen DESC LIMIT 500"), use_container_width=True)
+
+    # Written chunk by chunk, so large tables never have to fit in memory
+    formats = ["csv"] + (["parquet"] if leadstore.pyarrow is not None else [])
+    export_format = st.radio("Export format:", formats, horizontal=True)
+    if st.button("📤 Export leads"):
+        os.makedirs(EXPORTS_FOLDER, exist_ok=True)
+        path = os.path.join(EXPORTS_FOLDER, f"leads-{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}")
+        try:
+            size = leadstore.write_export(DB_PATH, path, export_format)
+            st.success(f"✅ Exported leads to {os.path.abspath(path)} ({size / 1024:.1f} KB)")
+        except Exception as e:
+            st.error(f"❌ Error exporting: {e}")
@@ -0,0 +1,123 @@
+"""
+Tail-latency benchmark for multi-profile routing and hedging (chatbot_common/routing.py).
+
+Starts one in-process fake Bedrock per inference profile and sends the same
+workload through call_llm_api in three setups:
+
+    single     one profile, no hedging (the old behaviour)
+    failover   all profiles, health-scored routing
+    hedged     all profiles, routing plus LLM_HEDGE
+
+    python benchmarks/bench_failover.py --app tensai --calls 300 --latency lognormal:-2.3,1.0
+    python benchmarks/bench_failover.py --throttle-rates 0.3,0
+
+--throttle-rates takes one value per profile, so one region can be made to
+throttle while the other stays healthy.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "tools"))
+import harness # noqa: E402
+import fake_bedrock # noqa: E402
+
+SETUPS = ("single", "failover", "hedged")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def write_profiles(app_key, urls):
+    """Create a workspace whose secrets.json lists one profile per fake server."""
+    root, workdir = harness.make_workspace(app_key)
+    secrets = dict(harness.FAKE_SECRETS, BEDROCK_PROFILES=[
+        {"name": f"profile{index}", "BEDROCK_ENDPOINT_URL": url,
+         "INFERENCE_PROFILE_ARN": f"arn:aws:bedrock:us-east-1:000000000000:inference-profile/p{index}"}
+        for index, url in enumerate(urls)
+    ])
+    for path in (os.path.join(root, "secrets.json"), os.path.join(workdir, "secrets.json")):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(secrets, f)
+    return workdir
+
+
+def measure(app_key, setup, servers, calls, concurrency, hedge_delay):
+    urls = [url for _, url in servers]
+    workdir = write_profiles(app_key, urls[:1] if setup == "single" else urls)
+    os.chdir(workdir)
+    bot = harness.import_app(app_key)
+    bot.create_app({"LLM_HEDGE": setup == "hedged", "LLM_HEDGE_DELAY": hedge_delay})
+    before = [dict(server.RequestHandlerClass.config.stats) for server, _ in servers]
+
+    def one_call(index):
+        start = time.perf_counter()
+        # Unique questions so single-flight never merges calls
+        reply = bot.call_llm_api([{"role": "user", "content": f"question {index}"}])
+        return time.perf_counter() - start, reply.startswith("An error occurred")
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one_call, range(calls)))
+
+    latencies = [seconds for seconds, _ in results]
+    upstream = [server.RequestHandlerClass.config.stats["requests"] - stats["requests"]
+                for (server, _), stats in zip(servers, before)]
+    return {
+        "setup": setup,
+        "p50_ms": round(statistics.median(latencies) * 1000.0, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000.0, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000.0, 1),
+        "max_ms": round(max(latencies) * 1000.0, 1),
+        "errors": sum(1 for _, failed in results if failed),
+        "upstream_requests": upstream,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-profile routing and hedging benchmark.")
+    parser.add_argument("--app", choices=sorted(harness.APP_DIRS), default="tensai")
+    parser.add_argument("--profiles", type=int, default=2)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", default="lognormal:-2.3,1.0", help="fake Bedrock latency spec")
+    parser.add_argument("--throttle-rates", default="0", help="comma-separated, one per profile")
+    parser.add_argument("--hedge-delay", type=float, default=0.3, help="delay before p95 is known")
+    parser.add_argument("--setups", default=",".join(SETUPS))
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args()
+
+    # Per-profile URLs come from secrets.json; the global override would hide them
+    os.environ.pop("BEDROCK_ENDPOINT_URL", None)
+    rates = [float(rate) for rate in args.throttle_rates.split(",")]
+    servers = [fake_bedrock.start_in_thread(latency=args.latency, throttle_rate=rates[min(index, len(rates) - 1)])
+               for index in range(args.profiles)]
+    results = []
+    try:
+        for setup in args.setups.split(","):
+            result = measure(args.app, setup, servers, args.calls, args.concurrency, args.hedge_delay)
+            results.append(result)
+            print(f"{setup:<9} p50={result['p50_ms']:>7.1f}ms p95={result['p95_ms']:>7.1f}ms "
+                  f"p99={result['p99_ms']:>7.1f}ms max={result['max_ms']:>7.1f}ms "
+                  f"errors={result['errors']} upstream={result['upstream_requests']}")
+    finally:
+        for server, _ in servers:
+            server.shutdown()
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"app": args.app, "args": vars(args), "meta": harness.environment_info(),
+                       "results": results}, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
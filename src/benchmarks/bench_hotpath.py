@@ -0,0 +1,106 @@
+"""
+Microbenchmarks for the per-request building blocks of both bots (chatbot_common/chatbot.py).
+
+Runs fully offline: Bedrock calls are stubbed in-process and every app is
+loaded into its own scratch workspace (see harness.load_app).
+
+    python benchmarks/bench_hotpath.py run --save benchmarks/baselines/hotpath.json
+    python benchmarks/bench_hotpath.py compare benchmarks/baselines/hotpath.json current.json
+"""
+import io
+import os
+import sys
+import json
+import datetime
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness # noqa: E402
+from chatbot_common import chatbot # noqa: E402
+
+HISTORY_SIZES = (10, 100, 1000)
+FOLDER_SIZES = (10, 100, 1000)
+
+LEAD = {"name": "Asha", "phone": "9876543210", "email": "asha@example.com", "pain_points": "Slow support"}
+LLM_ANSWERS = {
+    "plain": json.dumps(LEAD),
+    "fenced_json": "Here you go:\n```json\n" + json.dumps(LEAD, indent=4) + "\n```",
+    "fenced": "```\n" + json.dumps(LEAD) + "\n```",
+    "invalid": "Sorry, I could not find any details.",
+}
+
+_devnull = open(os.devnull, "w")
+
+
+def sample_history(turns):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Question {i}: what services do you offer?"})
+        history.append({"role": "assistant", "content": f"Answer {i}: we build AI chatbots and automation."})
+    return history
+
+
+def make_json_folder(workdir, count):
+    folder = os.path.join(workdir, f"bench_files_{count}")
+    os.makedirs(folder, exist_ok=True)
+    for i in range(count):
+        with open(os.path.join(folder, f"chat_{i:05d}.json"), "w", encoding="utf-8") as f:
+            f.write("[]")
+    return folder
+
+
+def app_benchmarks(app_key):
+    """Yield (name, callable) pairs for one app, after switching into its workspace."""
+    bot, _, workdir = harness.load_app(app_key, LLM_ANSWERS["plain"])
+    bot.init_db()
+
+    with open(os.path.join(workdir, "document.pdf"), "rb") as f:
+        pdf_bytes = f.read()
+    yield f"{app_key}.extract_text_from_pdf", lambda: chatbot.extract_text_from_pdf(io.BytesIO(pdf_bytes))
+
+    # The prompt itself (build_system_message caches it), then one chat call
+    # through the cached prompt, single-flight, breaker, router and stubbed client
+    yield f"{app_key}.render_system_message", bot.render_system_message
+    history = sample_history(5)
+    yield f"{app_key}.call_llm_api.stubbed_bedrock", lambda: bot.call_llm_api(history)
+
+    user_id = bot.get_or_create_user_id(None)
+    yield f"{app_key}.update_user_info", lambda: bot.update_user_info(
+        user_id, username="Asha", phone_number="9876543210", email="asha@example.com",
+        pain_points="Slow support")
+    yield f"{app_key}.save_conversation", lambda: bot.save_conversation(
+        user_id, "What do you do?", "We build AI chatbots.")
+
+    for size in HISTORY_SIZES:
+        history_user = bot.get_or_create_user_id(None)
+        for i in range(size):
+            bot.save_conversation(history_user, f"Question {i}", f"Answer {i}")
+        yield (f"{app_key}.get_conversation_history_from_db[{size}]",
+               lambda uid=history_user: bot.get_conversation_history_from_db(uid))
+
+    cutoff = datetime.datetime.now() - datetime.timedelta(hours=24)
+    for size in FOLDER_SIZES:
+        folder = make_json_folder(workdir, size)
+        yield (f"{app_key}.latest_file_in_last_24h[{size}]",
+               lambda folder=folder: chatbot.latest_file_in_last_24h(folder, cutoff))
+
+    conversation = sample_history(3)
+    original_call_model = bot.call_model
+    for label, answer in LLM_ANSWERS.items():
+        def extract(answer=answer):
+            bot.call_model = lambda call_type, messages, **kwargs: answer
+            try:
+                with contextlib.redirect_stdout(_devnull):
+                    return bot.extract_lead_details_from_conversation(conversation)
+            finally:
+                bot.call_model = original_call_model
+        yield f"{app_key}.extract_lead_details.{label}", extract
+
+
+def collect_benchmarks():
+    for app_key in harness.APP_DIRS:
+        yield from app_benchmarks(app_key)
+
+
+if __name__ == '__main__':
+    harness.main("hotpath", collect_benchmarks)
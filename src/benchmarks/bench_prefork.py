@@ -0,0 +1,127 @@
+"""
+Scaling benchmark for the pre-fork serving mode (serve.py).
+
+Starts an in-process fake Bedrock, then for each worker count launches
+serve.py in a scratch workspace, drives /chat with tools/loadtest.py and
+reports requests/sec plus RSS and PSS (proportional set size, which
+splits shared copy-on-write pages between processes) per worker.
+
+    python benchmarks/bench_prefork.py --app tensai --workers 1,2,4 --sessions 200
+"""
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import argparse
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "tools"))
+import harness # noqa: E402
+import fake_bedrock # noqa: E402
+import loadtest # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server did not open port {port}")
+
+
+def child_pids(pid):
+    path = f"/proc/{pid}/task/{pid}/children"
+    with open(path, "r", encoding="utf-8") as f:
+        return [int(p) for p in f.read().split()]
+
+
+def memory_kb(pid):
+    """Return (rss_kb, pss_kb) from /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r", encoding="utf-8") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key] = int(rest.split()[0])
+    return values.get("Rss", 0), values.get("Pss", 0)
+
+
+def measure(app_key, workers, endpoint_url, users, sessions):
+    _, workdir = harness.make_workspace(app_key)
+    port = free_port()
+    env = dict(os.environ, BEDROCK_ENDPOINT_URL=endpoint_url, SLOW_REQUEST_MS="1e9")
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(harness.APP_DIRS[app_key], "serve.py"),
+         "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--no-lead-worker"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        test = loadtest.LoadTest(f"http://127.0.0.1:{port}/chat", question_turns=2, seed=1)
+        report = test.run(users, sessions=sessions)
+        worker_memory = [memory_kb(pid) for pid in child_pids(process.pid)]
+        master_memory = memory_kb(process.pid)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+
+    return {
+        "workers": workers,
+        "throughput_rps": report["throughput_rps"],
+        "p50_ms": report["p50_ms"],
+        "p95_ms": report["p95_ms"],
+        "errors": report["errors"],
+        "master_rss_kb": master_memory[0],
+        "worker_rss_kb": [rss for rss, _ in worker_memory],
+        "worker_pss_kb": [pss for _, pss in worker_memory],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-fork scaling benchmark.")
+    parser.add_argument("--app", choices=sorted(harness.APP_DIRS), default="tensai")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--users-per-worker", type=int, default=8)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--latency", default="fixed:0.02", help="fake Bedrock latency spec")
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args()
+
+    server, endpoint_url = fake_bedrock.start_in_thread(latency=args.latency)
+    results = []
+    try:
+        for workers in [int(w) for w in args.workers.split(",")]:
+            result = measure(args.app, workers, endpoint_url, workers * args.users_per_worker, args.sessions)
+            results.append(result)
+            rss = sum(result["worker_rss_kb"]) / max(1, len(result["worker_rss_kb"]))
+            pss = sum(result["worker_pss_kb"]) / max(1, len(result["worker_pss_kb"]))
+            print(f"workers={workers:<3} {result['throughput_rps']:>8.1f} req/s  "
+                  f"p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms errors={result['errors']}  "
+                  f"RSS/worker={rss / 1024:.1f}MB PSS/worker={pss / 1024:.1f}MB "
+                  f"master RSS={result['master_rss_kb'] / 1024:.1f}MB")
+    finally:
+        server.shutdown()
+
+    if results:
+        base = results[0]["throughput_rps"] or 1
+        for result in results:
+            print(f"  {result['workers']} worker(s): {result['throughput_rps'] / base:.2f}x throughput")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"app": args.app, "meta": harness.environment_info(), "results": results}, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Cold-start benchmark for both apps.
+
+Every sample runs in a fresh interpreter and records how long each phase
+of bringing an app up takes:
+
+    import       importing app.py
+    create_app   building the Flask app (lazy: no secrets, boto3 or PDF)
+    warm_up      DB schema, boto3 client construction and PDF text extraction
+    first_chat   first POST /chat after warm-up: a question with a phone number,
+                 so lead capture passes it to the model (Bedrock answered in-process)
+
+    python benchmarks/bench_startup.py run --samples 5 --save benchmarks/baselines/startup.json
+    python benchmarks/bench_startup.py compare benchmarks/baselines/startup.json current.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness # noqa: E402
+
+PHASES = ("import", "create_app", "warm_up", "first_chat", "total")
+
+
+def child(app_key):
+    """Measure one cold start; prints the phase timings as JSON."""
+    root, workdir = harness.make_workspace(app_key)
+    os.chdir(workdir)
+    timings = {}
+
+    start = time.perf_counter()
+    bot = harness.import_app(app_key)
+    timings["import"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    app = bot.create_app()
+    timings["create_app"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bot.warm_up()
+    timings["warm_up"] = time.perf_counter() - start
+
+    # Keep the boto3 client construction in warm_up but answer the chat in-process
+    fake = harness.FakeBedrockClient("We build AI chatbots. May I have your name as well?")
+    for endpoint in bot.get_llm_router().endpoints:
+        endpoint.client = fake
+    client = app.test_client()
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            response = client.post("/chat", json={"user_query": "9876543210, what services do you offer?"})
+        finally:
+            sys.stdout = stdout
+    timings["first_chat"] = time.perf_counter() - start
+    if response.status_code != 200:
+        raise SystemExit(f"/chat returned {response.status_code}")
+    if not fake.calls:
+        raise SystemExit("first_chat was answered without the model")
+
+    timings["total"] = sum(timings.values())
+    print(json.dumps(timings))
+
+
+def run(samples):
+    results = {}
+    for app_key in harness.APP_DIRS:
+        collected = {phase: [] for phase in PHASES}
+        for _ in range(samples):
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "_child", app_key],
+                                    check=True, capture_output=True, text=True).stdout
+            timings = json.loads(output.strip().splitlines()[-1])
+            for phase in PHASES:
+                collected[phase].append(timings[phase])
+        for phase in PHASES:
+            values = collected[phase]
+            name = f"{app_key}.startup.{phase}"
+            results[name] = {
+                "iterations": 1,
+                "repeats": samples,
+                "min_us": round(min(values) * 1e6, 3),
+                "median_us": round(statistics.median(values) * 1e6, 3),
+                "mean_us": round(statistics.mean(values) * 1e6, 3),
+                "stdev_us": round(statistics.stdev(values) * 1e6, 3) if samples > 1 else 0.0,
+            }
+            print(f"{name:<40} median {results[name]['median_us'] / 1000:>9.1f} ms  "
+                  f"(min {results[name]['min_us'] / 1000:.1f} ms, n={samples})")
+    return results
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "_child":
+        return child(sys.argv[2])
+
+    parser = argparse.ArgumentParser(description="startup benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="measure cold starts")
+    run_parser.add_argument("--samples", type=int, default=5)
+    run_parser.add_argument("--save", help="write results JSON to this path")
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        if harness.compare_results(args.baseline, args.current, args.threshold):
+            sys.exit(1)
+        return
+    results = run(args.samples)
+    if args.save:
+        harness.save_results(args.save, results, "startup")
+
+
+if __name__ == '__main__':
+    main()
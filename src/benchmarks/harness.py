@@ -0,0 +1,231 @@
+"""
+Small offline benchmark harness shared by the bench_*.py scripts.
+
+Each benchmark is a zero-argument callable. The harness calibrates the
+number of inner iterations so one repeat takes at least --min-time
+seconds, runs several repeats and stores per-call timings as JSON:
+
+    python benchmarks/bench_hotpath.py run --save benchmarks/baselines/hotpath.json
+    python benchmarks/bench_hotpath.py run --save /tmp/current.json
+    python benchmarks/bench_hotpath.py compare benchmarks/baselines/hotpath.json /tmp/current.json
+
+`compare` exits with status 1 when any benchmark's median got slower than
+the --threshold ratio, so it can gate a deploy.
+"""
+import os
+import sys
+import json
+import atexit
+import time
+import shutil
+import platform
+import argparse
+import datetime
+import tempfile
+import statistics
+import importlib.util
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)  # for chatbot_common
+APP_DIRS = {
+    "tensai": os.path.join(SRC_DIR, "TensAI_Chatbot"),
+    "qbytz": os.path.join(SRC_DIR, "Qbytz_Bot"),
+}
+
+FAKE_SECRETS = {
+    "aws_access_key_id": "benchmark",
+    "aws_secret_access_key": "benchmark",
+    "INFERENCE_PROFILE_ARN": "arn:aws:bedrock:us-east-1:000000000000:inference-profile/benchmark",
+    "REGION": "us-east-1",
+}
+
+
+# -------------------------------
+# App Loading
+# -------------------------------
+def make_workspace(app_key):
+    """Create a scratch directory laid out like a deployment of one app."""
+    root = tempfile.mkdtemp(prefix=f"bench_{app_key}_")
+    atexit.register(shutil.rmtree, root, True)
+    workdir = os.path.join(root, os.path.basename(APP_DIRS[app_key]))
+    os.makedirs(workdir)
+    for secrets_path in (os.path.join(root, "secrets.json"), os.path.join(workdir, "secrets.json")):
+        with open(secrets_path, "w", encoding="utf-8") as f:
+            json.dump(FAKE_SECRETS, f)
+    shutil.copy(os.path.join(APP_DIRS[app_key], "document.pdf"), workdir)
+    return root, workdir
+
+
+def import_app(app_key):
+    """Import one app.py under a unique module name (app_dir goes on sys.path); returns its Chatbot."""
+    app_dir = APP_DIRS[app_key]
+    if app_dir not in sys.path:
+        sys.path.insert(0, app_dir)
+    module_name = f"{app_key}_app"
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(app_dir, "app.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module.bot
+
+
+def load_app(app_key, reply_text="OK"):
+    """Import an app inside a scratch workspace and build it with a fake Bedrock client.
+
+    Returns (bot, flask_app, workdir). The process working directory is
+    left at workdir because the apps resolve their paths relative to it.
+    """
+    root, workdir = make_workspace(app_key)
+    os.chdir(workdir)
+    bot = import_app(app_key)
+    flask_app = bot.create_app({"BEDROCK_CLIENT": FakeBedrockClient(reply_text)})
+    return bot, flask_app, workdir
+
+
+class FakeBody:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+class FakeBedrockClient:
+    """In-process bedrock-runtime client that answers instantly with fixed text."""
+
+    class exceptions:
+        class ThrottlingException(Exception):
+            pass
+
+    def __init__(self, text):
+        self.body = json.dumps({
+            "content": [{"type": "text", "text": text}],
+            "usage": {"input_tokens": 1, "output_tokens": 1},
+        }).encode("utf-8")
+        self.calls = 0
+
+    def invoke_model(self, **kwargs):
+        self.calls += 1
+        return {"body": FakeBody(self.body)}
+
+
+# -------------------------------
+# Timing
+# -------------------------------
+def time_callable(func, min_time=0.05, repeats=5):
+    func()  # warm-up
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    per_call = [elapsed / number]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        per_call.append((time.perf_counter() - start) / number)
+
+    return {
+        "iterations": number,
+        "repeats": repeats,
+        "min_us": round(min(per_call) * 1e6, 3),
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+        "mean_us": round(statistics.mean(per_call) * 1e6, 3),
+        "stdev_us": round(statistics.stdev(per_call) * 1e6, 3) if len(per_call) > 1 else 0.0,
+    }
+
+
+def run_benchmarks(benchmarks, min_time=0.05, repeats=5, name_filter=None):
+    results = {}
+    for name, func in benchmarks:
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = time_callable(func, min_time=min_time, repeats=repeats)
+        stats = results[name]
+        print(f"{name:<60} median {stats['median_us']:>12.1f} us  "
+              f"(min {stats['min_us']:.1f}, n={stats['iterations']}x{stats['repeats']})")
+    return results
+
+
+def environment_info():
+    return {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def save_results(path, results, suite):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"suite": suite, "meta": environment_info(), "results": results}, f, indent=4)
+    print(f"Saved {len(results)} results to {path}")
+
+
+# -------------------------------
+# Comparison
+# -------------------------------
+def compare_results(baseline_path, current_path, threshold=0.10, key="median_us"):
+    """Print a per-benchmark comparison; return the list of regressions."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    with open(current_path, "r", encoding="utf-8") as f:
+        current = json.load(f)["results"]
+
+    regressions = []
+    print(f"{'benchmark':<60} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name in sorted(set(baseline) | set(current)):
+        if name not in baseline or name not in current:
+            status = "new" if name not in baseline else "removed"
+            print(f"{name:<60} {status:>35}")
+            continue
+        before, after = baseline[name][key], current[name][key]
+        ratio = (after - before) / before if before else 0.0
+        flag = ""
+        if ratio > threshold:
+            flag = "  SLOWER"
+            regressions.append(name)
+        elif ratio < -threshold:
+            flag = "  faster"
+        print(f"{name:<60} {before:>12.1f} {after:>12.1f} {ratio * 100:>+8.1f}%{flag}")
+    return regressions
+
+
+def main(suite, collect_benchmarks):
+    """Command-line entry point used by each bench_*.py script."""
+    parser = argparse.ArgumentParser(description=f"{suite} benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--save", help="write results JSON to this path")
+    run_parser.add_argument("--filter", help="only run benchmarks whose name contains this")
+    run_parser.add_argument("--min-time", type=float, default=0.05)
+    run_parser.add_argument("--repeats", type=int, default=5)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="allowed slowdown ratio before failing (default 0.10)")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        regressions = compare_results(args.baseline, args.current, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+        return
+
+    save_path = os.path.abspath(args.save) if args.save else None
+    results = run_benchmarks(collect_benchmarks(), min_time=args.min_time,
+                             repeats=args.repeats, name_filter=args.filter)
+    if save_path:
+        save_results(save_path, results, suite)
@@ -0,0 +1,6 @@
+"""
+Code shared by the TensAI and Qbytz bots: the chat, LLM and lead pipeline
+(chatbot), metrics, tracing, Bedrock routing and circuit breaking,
+single-flight, lead capture and the leads store, plus the pre-fork
+server. Each app puts src/ on sys.path and builds its bot from here.
+"""
@@ -0,0 +1,90 @@
+"""
+Circuit breaker for the model client and the replies served while it is open.
+
+    closed     calls go through; consecutive failures are counted
+    open       calls fail fast for reset_timeout seconds
+    half_open  one probe call is let through; success closes the circuit,
+               failure opens it again
+"""
+import re
+import time
+import threading
+from collections import OrderedDict
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """Return True if a call may go out now; at most one probe while half-open."""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self._state = HALF_OPEN
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class ReplyCache:
+    """Bounded map of normalized questions to known-good answers."""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._replies = OrderedDict()
+
+    @staticmethod
+    def normalize(question):
+        return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+    def put(self, question, reply):
+        key = self.normalize(question)
+        if not key or self.max_size <= 0:
+            return
+        with self._lock:
+            self._replies[key] = reply
+            self._replies.move_to_end(key)
+            while len(self._replies) > self.max_size:
+                self._replies.popitem(last=False)
+
+    def get(self, question):
+        with self._lock:
+            return self._replies.get(self.normalize(question))
+
+    def __len__(self):
+        return len(self._replies)
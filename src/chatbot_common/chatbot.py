@@ -0,0 +1,1309 @@
+"""
+The chat, LLM and lead pipeline shared by every bot.
+
+A bot is a Chatbot built from a config dict: the document, system prompt,
+sales contact, lead rules, history mode and folders. TensAI_Chatbot/app.py
+and Qbytz_Bot/app.py only hold their config, and multitenant/server.py
+builds one Chatbot per tenants.json entry. Each Chatbot keeps its own
+config, caches, circuit breaker and DB, so several can share a process.
+"""
+import os
+import re
+import copy
+import json
+import datetime
+import time
+import sqlite3
+import threading
+from flask import Flask, Blueprint, request, jsonify, render_template, Response, send_from_directory, abort # type: ignore
+from flask_cors import CORS # type: ignore
+import uuid
+import hmac
+import mimetypes
+
+from . import metrics, tracing, singleflight, routing, breaker, leadcapture, leadstore
+
+# -------------------------------
+# Configuration
+# -------------------------------
+# Paths are relative to the working directory unless absolute.
+# create_app() overrides any of them; the secrets, Bedrock client, PDF
+# text and DB schema are only loaded on first use or by warm_up(), so
+# building a Chatbot stays cheap.
+DEFAULT_CONFIG = {
+    "SECRETS_FILE": "secrets.json",
+    "DOCUMENT_PATH": "document.pdf",
+    "DB_PATH": "user_conversations.db",
+    "CONVERSATIONS_FOLDER": "conversations",
+    "CONTACTS_FOLDER": "contacts",
+    "TEMPLATE_FOLDER": "templates",    # holds modified_ui.html, served at /
+    "BEDROCK_CLIENT": None,  # pre-built bedrock-runtime client to use instead of boto3
+    "LLM_ROUTER": None,      # routing.Router shared with other tenants (multitenant/server.py)
+    "WARM_UP": False,        # load everything inside create_app()
+    "LLM_SINGLEFLIGHT": True,          # share one Bedrock call between identical concurrent requests
+    "LLM_SINGLEFLIGHT_TIMEOUT": 120.0, # seconds a coalesced caller waits for the shared call
+    "LLM_HEDGE": False,                # send a backup request when the first one is slower than its p95
+    "LLM_HEDGE_DELAY": 2.0,            # hedge delay (seconds) until a profile has enough latency samples
+    "LLM_BREAKER_FAILURES": 5,         # consecutive failed model calls that open the circuit
+    "LLM_BREAKER_RESET_SECONDS": 30.0, # how long the circuit stays open before a probe call
+    "FAQ_PATH": "faq.json",            # optional {"question": "answer"} replies for degraded mode
+    "FAQ_CACHE_SIZE": 256,             # first-question answers remembered for degraded mode
+    # Model tier ("default" = INFERENCE_PROFILE_ARN, "light" = LIGHT_INFERENCE_PROFILE_ARN), output budget
+    # and stop sequences per call type; "escalate" overrides them for one retry when the answer is cut
+    # off or unusable
+    "LLM_TIERS": {
+        "chat": {"model": "default", "max_tokens": 400,  # replies are asked to stay under 50 words
+                 "escalate": {"max_tokens": 4096}},
+        "lead_extraction": {"model": "light", "max_tokens": 256, "stop_sequences": ["}"],
+                            "escalate": {"model": "default", "max_tokens": 1024, "stop_sequences": []}},
+        "lead_extraction_batch": {"model": "light", "max_tokens": 2048, "stop_sequences": ["]"],
+                                  "escalate": {"model": "default", "max_tokens": 4096, "stop_sequences": []}},
+        "summarization": {"model": "light", "max_tokens": 512,
+                          "escalate": {"model": "default", "max_tokens": 1024}},
+    },
+    "BOT_NAME": "TensAI Chat",
+    "SALES_CONTACT": "sangita@nekko.tech",
+    "SYSTEM_PROMPT_FILE": None,        # prompt template replacing the built-in one, see build_system_message()
+    "LEAD_RULES": "always",            # prompt rules for Name and Mobile, a key of LEAD_RULE_SETS
+    "HISTORY_MODE": "file",            # what the model sees as the conversation, see HISTORY_MODES
+    "LEAD_CAPTURE": True,              # answer greeting / detail-collection turns without the model
+    "FALLBACK_REPLY": ("Sorry, I can't answer right now. Please leave your Name and Mobile Number "
+                       "and our team will get back to you, or write to {sales_contact}."),
+    "LEAD_POLL_SECONDS": 10,           # how often the background worker scans for changed conversations
+    "LEAD_BATCH_SIZE": 8,              # conversations per extraction call (1 = one call per conversation)
+    "LEAD_BATCH_MAX_TOKENS": 6000,     # estimated conversation tokens per extraction call
+    "CONTACT_FILES": False,            # also write contacts/lead_<file>.json next to the leads table
+    "EXPORT_CHUNK_SIZE": 1000,         # rows per chunk (and Parquet row group) in /leads/export
+    # Static site served next to the chat (None = no site routes)
+    "SITE_FOLDER": None,               # output of tools/build_assets.py: pages plus hashed assets/
+    "IMAGE_FOLDER": None,
+    "ASSET_MAX_AGE": 31536000,         # hashed bundles never change, so browsers may keep them a year
+    "IMAGE_MAX_AGE": 86400,
+}
+
+# Conversation the model sees on each turn:
+#   file     the newest conversations/*.json of the last 24 hours, shared by
+#            every visitor (the original TensAI behaviour)
+#   session  this session's last 24 hours of turns from the DB
+HISTORY_MODES = ("file", "session")
+
+# The {lead_rules} part of the system prompt, by LEAD_RULES and by whether
+# the visitor's Name and Mobile are already on record
+_ASK_FOR_DETAILS = """
+1. Customer Info First:
+   - Always greet the user and immediately ask for their Name and Mobile Number before answering any queries.
+   - Politely explain that these are required to assist them further.
+   - Optionally ask for Email and Organisation after Name & Mobile.
+
+2. Only Proceed After Details:
+   - Do not provide product information or answer questions until Name & Mobile are received.
+   - If user refuses, politely remind: "I need your Name and Mobile Number to assist you."
+"""
+_DETAILS_GIVEN = """
+- User already provided their Name and Mobile Number within the last 24 hours.
+- Do not ask for Name or Mobile again.
+- You may optionally confirm Email or Organisation politely if not yet collected.
+"""
+LEAD_RULE_SETS = {
+    # ask for Name and Mobile on every turn
+    "always": {"required": _ASK_FOR_DETAILS, "given": _ASK_FOR_DETAILS},
+    # stop asking once they are on record for the session
+    "until_given": {"required": _ASK_FOR_DETAILS, "given": _DETAILS_GIVEN},
+}
+
+DEFAULT_SYSTEM_PROMPT = """
+You are {bot_name}, a helpful website chatbot for our company. Always follow these rules:
+{lead_rules}
+3. Answering Queries:
+   - After collecting details, answer briefly (≤50 words) and stay relevant.
+   - If query is unrelated, reply: "I am a helpful assistant, please ask me something else."
+   - If user asks for sales contact, give {sales_contact}.
+
+4. Formatting:
+   - Do not use markdown formatting.
+   - Keep responses short, chat-friendly, and professional.
+
+Company info and product details:
+{company_info}
+"""
+
+# -------------------------------
+# Metrics
+# -------------------------------
+LLM_CALL_SECONDS = metrics.histogram(
+    "llm_call_seconds", "End-to-end call_llm_api latency including retries.", ["outcome"])
+LLM_INVOKE_SECONDS = metrics.histogram(
+    "llm_invoke_seconds", "Latency of a single Bedrock invoke_model attempt.", ["outcome"])
+LLM_RETRIES = metrics.counter("llm_retries_total", "Bedrock invocations retried after throttling.")
+LLM_THROTTLES = metrics.counter("llm_throttled_total", "Bedrock ThrottlingException responses.")
+LLM_TOKENS = metrics.counter("llm_tokens_total", "Tokens reported by Bedrock usage.", ["direction"])
+DB_QUERY_SECONDS = metrics.histogram(
+    "db_query_seconds", "Latency of SQLite helper functions.", ["operation"])
+PDF_LOAD_SECONDS = metrics.histogram(
+    "pdf_load_seconds", "Time spent extracting text from the company PDF.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+FILE_IO_SECONDS = metrics.histogram(
+    "conversation_file_io_seconds", "Conversation and contact JSON file I/O.", ["operation", "kind"])
+LLM_COALESCED = metrics.counter(
+    "llm_singleflight_coalesced_total", "call_llm_api calls answered by an identical in-flight request.")
+LLM_COALESCE_TIMEOUTS = metrics.counter(
+    "llm_singleflight_timeouts_total", "Coalesced callers that gave up waiting for the shared request.")
+LLM_PROFILE_REQUESTS = metrics.counter(
+    "llm_profile_requests_total", "Bedrock invoke_model attempts per inference profile.", ["profile", "outcome"])
+LLM_PROFILE_SCORE = metrics.gauge(
+    "llm_profile_health_score", "Routing score per inference profile (lower is healthier).", ["profile"])
+LLM_HEDGES = metrics.counter("llm_hedged_total", "Backup requests sent by hedging, by winner.", ["winner"])
+LLM_BREAKER_STATE = metrics.gauge(
+    "llm_circuit_state", "Model circuit breaker state (0 closed, 1 half-open, 2 open).")
+LLM_BREAKER_REJECTED = metrics.counter(
+    "llm_circuit_rejected_total", "Model calls failed fast because the circuit was open.")
+DEGRADED_REPLIES = metrics.counter(
+    "chat_degraded_replies_total", "Chat replies served without the model.", ["source"])
+LEAD_CAPTURE_TURNS = metrics.counter(
+    "lead_capture_local_turns_total", "Chat turns answered by the lead-capture script.", ["kind"])
+LLM_CALLS_AVOIDED = metrics.counter(
+    "lead_capture_llm_calls_avoided_total", "Model calls skipped by answering lead-capture turns locally.")
+LEAD_EXTRACTION_CALLS = metrics.counter(
+    "lead_extraction_llm_calls_total", "Background lead extraction model calls.", ["mode"])
+LEAD_BATCH_CONVERSATIONS = metrics.histogram(
+    "lead_extraction_conversations_per_call", "Conversations answered per background extraction call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64))
+LLM_TYPE_SECONDS = metrics.histogram(
+    "llm_call_type_seconds", "Model call latency per call type and model tier.", ["call_type", "model"])
+LLM_TYPE_TOKENS = metrics.counter(
+    "llm_call_type_tokens_total", "Tokens per call type and model tier.", ["call_type", "model", "direction"])
+LLM_ESCALATIONS = metrics.counter(
+    "llm_escalations_total", "Calls retried on the escalation tier, by reason.", ["call_type", "reason"])
+LEADS_RECORDED = metrics.counter("leads_recorded_total", "Lead sightings upserted into the leads table.",
+                                 ["source"])
+
+# Each chat turn that reaches the model costs the reply plus a synchronous
+# lead extraction call
+LLM_CALLS_PER_TURN = 2
+
+LEAD_FIELDS = ("name", "phone", "email", "pain_points")
+
+# Responsive variants written by tools/build_images.py: <name>-<width>.<hash8>.<ext>.
+# Only these never change under the same name; manifest.json next to them does.
+HASHED_IMAGE_RE = re.compile(r"variants/[^/]+-\d+\.[0-9a-f]{8}\.[a-z0-9]+")
+
+_BREAKER_STATE_VALUES = {breaker.CLOSED: 0, breaker.HALF_OPEN: 1, breaker.OPEN: 2}
+
+
+class LLMThrottled(Exception):
+    """Bedrock throttled one attempt on one inference profile."""
+
+class LLMUnavailable(Exception):
+    """The model could not answer: errors, throttling or an open circuit."""
+
+
+# -------------------------------
+# Helpers
+# -------------------------------
+def load_dict_from_json(file_path):
+    with open(file_path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    return data
+
+@metrics.time_function(PDF_LOAD_SECONDS)
+def extract_text_from_pdf(uploaded_file):
+    # uploaded_file should be a file-like object (e.g., BytesIO)
+    import fitz  # type: ignore # PyMuPDF
+    pdf_document = fitz.open(stream=uploaded_file.read(), filetype="pdf")
+    extracted_text = ""
+
+    for page in pdf_document:
+        extracted_text += page.get_text() + "\n"
+
+    pdf_document.close()
+    return extracted_text.strip()
+
+def build_payload(messages, tier, prefill=""):
+    payload = {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": tier["max_tokens"],
+        "messages": [
+            {
+                "role": "user",
+                "content": json.dumps(messages)
+            }
+        ]
+    }
+    if tier.get("stop_sequences"):
+        payload["stop_sequences"] = tier["stop_sequences"]
+    if prefill:
+        # The model continues from here, e.g. "{" for a bare JSON object
+        payload["messages"].append({"role": "assistant", "content": prefill})
+    return json.dumps(payload)
+
+def response_text(response_body, prefill=""):
+    """Reply text with the prefill and any matched stop sequence put back."""
+    text = response_body['content'][0]['text']
+    if response_body.get("stop_reason") == "stop_sequence" and response_body.get("stop_sequence"):
+        text += response_body["stop_sequence"]
+    return prefill + text
+
+def record_token_usage(response_body):
+    usage = response_body.get("usage") or {}
+    if usage.get("input_tokens"):
+        LLM_TOKENS.inc(usage["input_tokens"], direction="input")
+    if usage.get("output_tokens"):
+        LLM_TOKENS.inc(usage["output_tokens"], direction="output")
+
+def is_error_reply(message):
+    # Conversation files written before the circuit breaker may contain these
+    return message.get("role") == "assistant" and str(message.get("content", "")).startswith("An error occurred")
+
+def parse_llm_json(answer, opening="{"):
+    """Parse a JSON answer that may be wrapped in a code block; None if invalid."""
+    # If the answer is not valid JSON, try the contents of a code block
+    if not answer or not answer.strip().startswith(opening):
+        try:
+            # Attempt to extract JSON from code block
+            if "```json" in answer:
+                answer = answer.split("```json")[1].split("```")[0].strip()
+            elif "```" in answer:
+                answer = answer.split("```")[1].split("```")[0].strip()
+        except Exception:
+            return None
+
+    try:
+        # raw_decode ignores anything the model wrote after the JSON value
+        return json.JSONDecoder().raw_decode(answer.strip())[0]
+    except Exception:
+        return None
+
+def estimate_tokens(data):
+    # ~4 characters per token is close enough for packing batches
+    return len(json.dumps(data)) // 4 + 1
+
+def write_json_file(path, data):
+    """Write via a temp file and rename, so concurrent readers (other threads or
+    pre-forked workers) never see a half-written file."""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+# ---------------------------------------------------------
+# Helper: Find newest JSON file in last 24 hours
+# ---------------------------------------------------------
+def latest_file_in_last_24h(folder, cutoff):
+    """
+    Return the path of the single newest .json file if its
+    within the last 24 hours; else None.
+    """
+    newest_path = None
+    newest_ctime = None
+    for filename in os.listdir(folder):
+        if filename.endswith(".json"):
+            file_path = os.path.join(folder, filename)
+            ctime = datetime.datetime.fromtimestamp(os.path.getctime(file_path))
+            # If file was created after cutoff, consider it
+            if ctime >= cutoff:
+                # Keep track of whichever is newest
+                if newest_ctime is None or ctime > newest_ctime:
+                    newest_ctime = ctime
+                    newest_path = file_path
+    return newest_path
+
+# -------------------------------
+# Static site
+# -------------------------------
+# Only the built site and the images are exposed; the bot folder itself
+# also holds secrets.json and the database.
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+def send_precompressed(folder, filename, max_age, immutable=False):
+    """Send filename from folder, preferring a .br / .gz sibling the client accepts."""
+    folder = os.path.abspath(folder)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    for encoding, suffix in PRECOMPRESSED:
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(folder, filename + suffix)):
+            response = send_from_directory(folder, filename + suffix, mimetype=mimetype, max_age=max_age)
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(folder, filename, mimetype=mimetype, max_age=max_age)
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+class Chatbot:
+    """One bot: its config plus the state loaded lazily from it.
+
+    defaults are merged over DEFAULT_CONFIG; create_app(config) starts
+    from them again on every call.
+    """
+
+    def __init__(self, defaults=None):
+        self.defaults = dict(copy.deepcopy(DEFAULT_CONFIG), **copy.deepcopy(defaults or {}))
+        self.config = copy.deepcopy(self.defaults)
+        self._init_lock = threading.RLock()
+        self._llm_flight = singleflight.SingleFlight()
+        self._reset()
+
+    def _reset(self):
+        self._secrets = None
+        self._llm_router = None
+        self._company_info_text = None
+        self._system_messages = {}
+        self._db_ready = False
+        self._llm_breaker = breaker.CircuitBreaker(self.config["LLM_BREAKER_FAILURES"],
+                                                   self.config["LLM_BREAKER_RESET_SECONDS"])
+        self._faq_replies = breaker.ReplyCache(self.config["FAQ_CACHE_SIZE"])
+
+    # -------------------------------
+    # Database Setup
+    # -------------------------------
+    @metrics.time_function(DB_QUERY_SECONDS, operation="init_db")
+    def init_db(self):
+        conn = sqlite3.connect(self.config["DB_PATH"])
+        c = conn.cursor()
+
+        # Users table with pain_points column and expiry
+        c.execute('''CREATE TABLE IF NOT EXISTS users
+                     (user_id TEXT PRIMARY KEY,
+                      username TEXT,
+                      phone_number TEXT,
+                      email TEXT,
+                      pain_points TEXT,
+                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                      expires_at TIMESTAMP,
+                      llm_calls_avoided INTEGER DEFAULT 0)''')
+
+        # Databases created before the llm_calls_avoided column need it added
+        columns = [row[1] for row in c.execute("PRAGMA table_info(users)")]
+        if "llm_calls_avoided" not in columns:
+            try:
+                c.execute("ALTER TABLE users ADD COLUMN llm_calls_avoided INTEGER DEFAULT 0")
+            except sqlite3.OperationalError:
+                pass  # another worker added it first
+
+        c.execute('''CREATE TABLE IF NOT EXISTS conversations
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      user_id TEXT,
+                      username TEXT,
+                      phone_number TEXT,
+                      question TEXT,
+                      answer TEXT,
+                      pain_points TEXT,
+                      timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                      answered_by TEXT,
+                      FOREIGN KEY(user_id) REFERENCES users(user_id))''')
+
+        # answered_by is "model", "lead_capture", or NULL for degraded replies
+        columns = [row[1] for row in c.execute("PRAGMA table_info(conversations)")]
+        if "answered_by" not in columns:
+            try:
+                c.execute("ALTER TABLE conversations ADD COLUMN answered_by TEXT")
+            except sqlite3.OperationalError:
+                pass  # another worker added it first
+
+        leadstore.init_schema(c)
+
+        conn.commit()
+        conn.close()
+        self._db_ready = True
+
+    def connect_db(self):
+        """Open a connection, creating the schema on first use."""
+        if not self._db_ready:
+            with self._init_lock:
+                if not self._db_ready:
+                    self.init_db()
+        return sqlite3.connect(self.config["DB_PATH"])
+
+    # -------------------------------
+    # Configuration / Secrets (loaded lazily)
+    # -------------------------------
+    def get_secrets(self):
+        if self._secrets is None:
+            with self._init_lock:
+                if self._secrets is None:
+                    self._secrets = load_dict_from_json(self.config["SECRETS_FILE"])
+        return self._secrets
+
+    def build_bedrock_client(self, profile):
+        """Build a bedrock-runtime client for one profile (see routing.load_profiles)."""
+        if self.config["BEDROCK_CLIENT"] is not None:
+            return self.config["BEDROCK_CLIENT"]
+        import boto3 # type: ignore
+        # Point at a local stand-in (tools/fake_bedrock.py) for offline load tests
+        endpoint_url = os.environ.get("BEDROCK_ENDPOINT_URL") or profile.get("BEDROCK_ENDPOINT_URL")
+        return boto3.client('bedrock-runtime', region_name=profile["REGION"],
+                            aws_access_key_id=profile["aws_access_key_id"],
+                            aws_secret_access_key=profile["aws_secret_access_key"],
+                            endpoint_url=endpoint_url)
+
+    def get_llm_router(self):
+        """Return the router over the configured inference profiles; clients are built on first use."""
+        if self.config["LLM_ROUTER"] is not None:
+            return self.config["LLM_ROUTER"]
+        if self._llm_router is None:
+            with self._init_lock:
+                if self._llm_router is None:
+                    endpoints = [routing.Endpoint(profile, self.build_bedrock_client)
+                                 for profile in routing.load_profiles(self.get_secrets())]
+                    self._llm_router = routing.Router(endpoints)
+        return self._llm_router
+
+    # -------------------------------
+    # (Optional) Document Analysis
+    # -------------------------------
+    def get_company_info_text(self):
+        if self._company_info_text is None:
+            with self._init_lock:
+                if self._company_info_text is None:
+                    with open(self.config["DOCUMENT_PATH"], "rb") as f:
+                        self._company_info_text = extract_text_from_pdf(f)
+        return self._company_info_text
+
+    # -------------------------------
+    # LLM Call Function
+    # -------------------------------
+    def build_system_message(self, require_user_details=True):
+        """Return the system prompt; cached because the PDF text is static once loaded.
+
+        The template is SYSTEM_PROMPT_FILE, or DEFAULT_SYSTEM_PROMPT; it may
+        use {bot_name}, {sales_contact}, {lead_rules} and {company_info}.
+        """
+        message = self._system_messages.get(require_user_details)
+        if message is None:
+            message = self._system_messages[require_user_details] = self.render_system_message(
+                require_user_details)
+        return message
+
+    def render_system_message(self, require_user_details=True):
+        """Build the system prompt from its template, without the cache."""
+        template = DEFAULT_SYSTEM_PROMPT
+        if self.config["SYSTEM_PROMPT_FILE"]:
+            with open(self.config["SYSTEM_PROMPT_FILE"], "r", encoding="utf-8") as f:
+                template = f.read()
+        rules = LEAD_RULE_SETS[self.config["LEAD_RULES"]]
+        return template.format(bot_name=self.config["BOT_NAME"], sales_contact=self.config["SALES_CONTACT"],
+                               lead_rules=rules["required" if require_user_details else "given"],
+                               company_info=self.get_company_info_text())
+
+    def call_llm_api(self, conversation_history, require_user_details=True):
+        system_message = self.build_system_message(require_user_details)
+        messages = [{"role": "system", "content": system_message}] + conversation_history
+        return self.call_model("chat", messages)
+
+    def call_model(self, call_type, messages, prefill="", validate=None):
+        """Send messages with the model tier and output budget of call_type (see LLM_TIERS).
+
+        The answer is escalated once, to the tier's "escalate" settings, when it
+        was cut off by max_tokens or validate(text) rejects it. Returns the text.
+        """
+        tier = self.config["LLM_TIERS"][call_type]
+        steps = [tier] + ([dict(tier, **tier["escalate"])] if tier.get("escalate") else [])
+        text = None
+        for index, step in enumerate(steps):
+            model = step.get("model", "default")
+            start = time.perf_counter()
+            try:
+                response_body, shared = self.invoke_llm_shared(build_payload(messages, step, prefill), model)
+            except LLMUnavailable:
+                if text is None:
+                    raise
+                return text  # the cheaper answer is better than none
+            LLM_TYPE_SECONDS.observe(time.perf_counter() - start, call_type=call_type, model=model)
+            if not shared:
+                usage = response_body.get("usage") or {}
+                for direction in ("input", "output"):
+                    if usage.get(f"{direction}_tokens"):
+                        LLM_TYPE_TOKENS.inc(usage[f"{direction}_tokens"], call_type=call_type, model=model,
+                                            direction=direction)
+            text = response_text(response_body, prefill)
+
+            if response_body.get("stop_reason") == "max_tokens":
+                reason = "max_tokens"
+            elif validate is not None and not validate(text):
+                reason = "invalid"
+            else:
+                return text
+            if index + 1 < len(steps):
+                LLM_ESCALATIONS.inc(call_type=call_type, reason=reason)
+        return text
+
+    def invoke_llm_shared(self, body, model="default"):
+        """invoke_llm with single-flight; returns (response body, shared)."""
+        if not self.config["LLM_SINGLEFLIGHT"]:
+            return self.invoke_llm(body, model), False
+
+        # Identical payloads in flight at the same time (e.g. many visitors saying
+        # "hi") share one upstream call
+        key = singleflight.payload_key(model + body)
+        try:
+            response_body, shared = self._llm_flight.do(key, lambda: self.invoke_llm(body, model),
+                                                        timeout=self.config["LLM_SINGLEFLIGHT_TIMEOUT"])
+        except singleflight.SingleFlightTimeout as e:
+            LLM_COALESCE_TIMEOUTS.inc()
+            raise LLMUnavailable(str(e)) from e
+        if shared:
+            LLM_COALESCED.inc()
+        return response_body, shared
+
+    def invoke_llm(self, body, model="default"):
+        """Invoke Bedrock behind the circuit breaker; returns the response body or raises LLMUnavailable."""
+        if not self._llm_breaker.allow():
+            LLM_BREAKER_REJECTED.inc()
+            raise LLMUnavailable("Model circuit is open.")
+        try:
+            response_body = self.invoke_llm_routed(body, model)
+        except Exception:
+            self._llm_breaker.record_failure()
+            raise
+        else:
+            self._llm_breaker.record_success()
+            return response_body
+        finally:
+            LLM_BREAKER_STATE.set(_BREAKER_STATE_VALUES[self._llm_breaker.state])
+
+    def invoke_llm_routed(self, body, model="default"):
+        """Invoke Bedrock on the healthiest inference profile; returns the response body.
+
+        Throttled or failing profiles cool down and the next attempt goes to
+        another profile. Only when every profile is cooling down does the call
+        sleep. With LLM_HEDGE a backup request is sent after the profile's p95.
+        """
+        router = self.get_llm_router()
+        max_retries = 5
+        call_start = time.perf_counter()
+        for attempt in range(max_retries):
+            endpoint = router.choose()
+            wait_time = endpoint.cooldown_until - time.monotonic()
+            if wait_time > 0:
+                print(f"Throttled. Retrying in {wait_time:.1f}s...")
+                with tracing.span("bedrock.backoff", seconds=round(wait_time, 2)):
+                    time.sleep(wait_time)
+            try:
+                if self.config["LLM_HEDGE"]:
+                    response_body = self.invoke_hedged(router, endpoint, body, attempt, model)
+                else:
+                    response_body = self.invoke_endpoint(endpoint, body, attempt, model)
+                record_token_usage(response_body)
+                LLM_CALL_SECONDS.observe(time.perf_counter() - call_start, outcome="ok")
+                return response_body
+            except LLMThrottled:
+                LLM_RETRIES.inc()
+            except Exception as e:
+                # Fail over on errors too, but only while another profile is healthy
+                other = router.choose(exclude=(endpoint,))
+                if other is None or not other.available():
+                    LLM_CALL_SECONDS.observe(time.perf_counter() - call_start, outcome="error")
+                    raise LLMUnavailable(str(e)) from e
+                LLM_RETRIES.inc()
+        LLM_CALL_SECONDS.observe(time.perf_counter() - call_start, outcome="throttled")
+        raise LLMUnavailable("Max retries exceeded.")
+
+    def invoke_endpoint(self, endpoint, body, attempt, model="default"):
+        """One invoke_model attempt on one profile, recording its health; returns the response body."""
+        client = endpoint.client
+        attempt_start = time.perf_counter()
+        try:
+            with tracing.span("bedrock.invoke", attempt=attempt, profile=endpoint.name, model=model):
+                response = client.invoke_model(
+                    modelId=endpoint.model_for(model),
+                    contentType='application/json',
+                    accept='application/json',
+                    body=body
+                )
+                response_body = json.loads(response['body'].read())
+        except Exception as e:
+            outcome = "throttled" if isinstance(e, client.exceptions.ThrottlingException) else "error"
+            LLM_INVOKE_SECONDS.observe(time.perf_counter() - attempt_start, outcome=outcome)
+            LLM_PROFILE_REQUESTS.inc(profile=endpoint.name, outcome=outcome)
+            # Only throttling benches a profile; errors just lower its score
+            endpoint.record_failure(cooldown=outcome == "throttled")
+            LLM_PROFILE_SCORE.set(endpoint.score(), profile=endpoint.name)
+            if outcome == "throttled":
+                LLM_THROTTLES.inc()
+                raise LLMThrottled(str(e)) from e
+            raise
+        seconds = time.perf_counter() - attempt_start
+        LLM_INVOKE_SECONDS.observe(seconds, outcome="ok")
+        LLM_PROFILE_REQUESTS.inc(profile=endpoint.name, outcome="ok")
+        endpoint.record_success(seconds)
+        LLM_PROFILE_SCORE.set(endpoint.score(), profile=endpoint.name)
+        return response_body
+
+    def invoke_hedged(self, router, endpoint, body, attempt, model="default"):
+        """Send to endpoint and, if it is slower than its p95, also to a backup; first answer wins."""
+        backup = router.choose(exclude=(endpoint,))
+        if backup is None or not backup.available():
+            backup = endpoint
+        delay = endpoint.p95() or self.config["LLM_HEDGE_DELAY"]
+        # The attempts run on helper threads, outside the request trace (tracing.detached_context)
+        with tracing.span("bedrock.hedged", profile=endpoint.name, delay_ms=round(delay * 1000.0, 1)):
+            response_body, winner, hedged = routing.hedged_call(
+                lambda: self.invoke_endpoint(endpoint, body, attempt, model),
+                lambda: self.invoke_endpoint(backup, body, attempt, model),
+                delay)
+        if hedged:
+            LLM_HEDGES.inc(winner="backup" if winner else "primary")
+        return response_body
+
+    # -------------------------------
+    # Degraded Mode
+    # -------------------------------
+    def load_faq_replies(self):
+        """Seed the degraded-mode cache from FAQ_PATH, if that file exists."""
+        if os.path.exists(self.config["FAQ_PATH"]):
+            for question, answer in load_dict_from_json(self.config["FAQ_PATH"]).items():
+                self._faq_replies.put(question, answer)
+
+    def remember_reply(self, user_id, user_query, reply, *leads):
+        """Keep a reply for degraded mode if it can be shown to any visitor."""
+        # Only the session's first model answer: later ones may build on earlier
+        # ones ("yes", "how much?"). Greetings, detail prompts and degraded
+        # replies before it don't count.
+        if self.has_model_answers(user_id):
+            return
+        # Answers that mention the visitor's details can't be reused for others
+        if any(lead and leadcapture.mentions_details(reply, lead) for lead in leads):
+            return
+        self._faq_replies.put(user_query, reply)
+
+    def degraded_reply(self, user_query):
+        """Answer without the model: a known reply to the same question, else the contact fallback."""
+        reply = self._faq_replies.get(user_query)
+        if reply is not None:
+            DEGRADED_REPLIES.inc(source="faq")
+            return reply
+        DEGRADED_REPLIES.inc(source="contact")
+        return self.config["FALLBACK_REPLY"].format(sales_contact=self.config["SALES_CONTACT"])
+
+    # --- LLM Call for Lead Extraction (with robust parsing) ---
+    def extract_lead_details_from_conversation(self, conversation):
+        extraction_prompt = """
+        You are tasked with extracting the following details from this conversation:
+        - Name (if provided)
+        - Phone Number
+        - Email
+        - Any pain points or comments shared by the user
+
+        Return ONLY the information as a JSON object in this format:
+        {
+            "name": "",
+            "phone": "",
+            "email": "",
+            "pain_points": ""
+        }
+        """
+
+        user_query = f"The Conversation so far: {json.dumps(conversation)}"
+
+        # Only the extraction prompt: the company document is not needed here
+        with tracing.span("llm.lead_extraction"):
+            answer = self.call_model("lead_extraction", [
+                {"role": "system", "content": extraction_prompt},
+                {"role": "user", "content": user_query}
+            ], prefill="{", validate=lambda text: isinstance(parse_llm_json(text, "{"), dict))
+
+        print("LLM response:\n", answer)
+
+        lead = parse_llm_json(answer, opening="{")
+        if not isinstance(lead, dict):
+            return {"name": "", "phone": "", "email": "", "pain_points": ""}
+        return lead
+
+    def plan_lead_batches(self, conversations):
+        """Group conversation ids into batches under the size and token limits."""
+        batches = []
+        current, current_tokens = [], 0
+        for conversation_id, conversation in conversations.items():
+            tokens = estimate_tokens(conversation)
+            if current and (len(current) >= self.config["LEAD_BATCH_SIZE"]
+                            or current_tokens + tokens > self.config["LEAD_BATCH_MAX_TOKENS"]):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(conversation_id)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def extract_lead_details_batch(self, conversations):
+        """Extract leads for many conversations ({id: messages}) in as few calls as possible.
+
+        Returns {id: lead}. Conversations missing or malformed in a batch answer
+        are retried one at a time with extract_lead_details_from_conversation.
+        If the model becomes unavailable the remaining ids are left out.
+        """
+        extraction_prompt = """
+        You are tasked with extracting the following details from EACH conversation below:
+        - Name (if provided)
+        - Phone Number
+        - Email
+        - Any pain points or comments shared by the user
+
+        Return ONLY a JSON array with exactly one object per conversation, using the
+        conversation's "id", in this format:
+        [
+            {
+                "id": "",
+                "name": "",
+                "phone": "",
+                "email": "",
+                "pain_points": ""
+            }
+        ]
+        """
+
+        leads = {}
+        for batch in self.plan_lead_batches(conversations):
+            retry_ids = batch
+            if len(batch) > 1:
+                user_query = "The Conversations: " + json.dumps(
+                    [{"id": conversation_id, "conversation": conversations[conversation_id]}
+                     for conversation_id in batch])
+                try:
+                    with tracing.span("llm.lead_extraction_batch", size=len(batch)):
+                        answer = self.call_model("lead_extraction_batch", [
+                            {"role": "system", "content": extraction_prompt},
+                            {"role": "user", "content": user_query}
+                        ], prefill="[", validate=lambda text: isinstance(parse_llm_json(text, "["), list))
+                except LLMUnavailable as e:
+                    print(f"Model unavailable, leaving {len(conversations) - len(leads)} conversations for later: {e}")
+                    break
+                LEAD_EXTRACTION_CALLS.inc(mode="batch")
+
+                parsed = parse_llm_json(answer, opening="[")
+                by_id = {}
+                if isinstance(parsed, list):
+                    by_id = {str(item.get("id")): item for item in parsed if isinstance(item, dict)}
+                retry_ids = []
+                for conversation_id in batch:
+                    item = by_id.get(conversation_id)
+                    if item is None:
+                        retry_ids.append(conversation_id)
+                    else:
+                        leads[conversation_id] = {field: item.get(field) or "" for field in LEAD_FIELDS}
+                LEAD_BATCH_CONVERSATIONS.observe(len(batch) - len(retry_ids))
+
+            try:
+                for conversation_id in retry_ids:
+                    leads[conversation_id] = self.extract_lead_details_from_conversation(
+                        conversations[conversation_id])
+                    LEAD_EXTRACTION_CALLS.inc(mode="single")
+                    LEAD_BATCH_CONVERSATIONS.observe(1)
+            except LLMUnavailable as e:
+                print(f"Model unavailable, leaving {len(conversations) - len(leads)} conversations for later: {e}")
+                break
+        return leads
+
+    # -------------------------------
+    # User Session Management (24h expiry)
+    # -------------------------------
+    @metrics.time_function(DB_QUERY_SECONDS, operation="is_session_valid")
+    def is_session_valid(self, user_id):
+        """Check if the given session ID exists and is still valid."""
+        conn = self.connect_db()
+        c = conn.cursor()
+        c.execute("SELECT expires_at FROM users WHERE user_id=?", (user_id,))
+        row = c.fetchone()
+        conn.close()
+
+        if not row or not row[0]:
+            return False
+
+        expiry = datetime.datetime.fromisoformat(row[0])
+        return datetime.datetime.now() < expiry
+
+    @metrics.time_function(DB_QUERY_SECONDS, operation="get_or_create_user_id")
+    def get_or_create_user_id(self, session_id=None, user_info=None):
+        """Get a valid session_id or create a new one if expired/nonexistent."""
+        if session_id and self.is_session_valid(session_id):
+            # Update user info if provided
+            if user_info:
+                self.update_user_info(session_id,
+                                      username=user_info.get("name") or None,
+                                      phone_number=user_info.get("phone") or None,
+                                      email=user_info.get("email") or None,
+                                      pain_points=user_info.get("pain_points") or None)
+            return session_id
+        else:
+            # Create a new session with 24h expiry
+            new_session_id = str(uuid.uuid4())
+            expiry_time = datetime.datetime.now() + datetime.timedelta(hours=24)
+
+            conn = self.connect_db()
+            c = conn.cursor()
+            c.execute("""
+                INSERT INTO users (user_id, username, phone_number, email, pain_points, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (
+                new_session_id,
+                user_info.get("name") if user_info else None,
+                user_info.get("phone") if user_info else None,
+                user_info.get("email") if user_info else None,
+                user_info.get("pain_points") if user_info else None,
+                expiry_time.isoformat()
+            ))
+            conn.commit()
+            conn.close()
+            return new_session_id
+
+    @metrics.time_function(DB_QUERY_SECONDS, operation="update_user_info")
+    def update_user_info(self, user_id, username=None, phone_number=None, email=None, pain_points=None):
+        conn = self.connect_db()
+        c = conn.cursor()
+
+        update_fields = []
+        params = []
+
+        if username:
+            update_fields.append("username = ?")
+            params.append(username)
+        if phone_number:
+            update_fields.append("phone_number = ?")
+            params.append(phone_number)
+        if email:
+            update_fields.append("email = ?")
+            params.append(email)
+        if pain_points:
+            update_fields.append("pain_points = ?")
+            params.append(pain_points)
+
+        if update_fields:
+            query = "UPDATE users SET " + ", ".join(update_fields) + " WHERE user_id = ?"
+            params.append(user_id)
+            c.execute(query, params)
+            conn.commit()
+
+        conn.close()
+
+    @metrics.time_function(DB_QUERY_SECONDS, operation="save_conversation")
+    def save_conversation(self, user_id, question, answer, answered_by=None):
+        conn = self.connect_db()
+        c = conn.cursor()
+        c.execute("INSERT INTO conversations (user_id, question, answer, answered_by) VALUES (?, ?, ?, ?)",
+                  (user_id, question, answer, answered_by))
+        conn.commit()
+        conn.close()
+
+    @metrics.time_function(DB_QUERY_SECONDS, operation="has_model_answers")
+    def has_model_answers(self, user_id):
+        """True if the model already answered a turn of this session."""
+        conn = self.connect_db()
+        c = conn.cursor()
+        c.execute("SELECT 1 FROM conversations WHERE user_id = ? AND answered_by = 'model' LIMIT 1", (user_id,))
+        row = c.fetchone()
+        conn.close()
+        return row is not None
+
+    @metrics.time_function(DB_QUERY_SECONDS, operation="get_conversation_history_from_db")
+    def get_conversation_history_from_db(self, user_id):
+        conn = self.connect_db()
+        c = conn.cursor()
+        twenty_four_hours_ago = datetime.datetime.now() - datetime.timedelta(hours=24)
+        c.execute("""
+            SELECT question, answer FROM conversations
+            WHERE user_id = ? AND timestamp >= ?
+            ORDER BY timestamp ASC
+        """, (user_id, twenty_four_hours_ago))
+        rows = c.fetchall()
+        conn.close()
+
+        history = []
+        for q, a in rows:
+            if q:
+                history.append({"role": "user", "content": q})
+            if a:
+                history.append({"role": "assistant", "content": a})
+        return history
+
+    @metrics.time_function(DB_QUERY_SECONDS, operation="get_session_lead")
+    def get_session_lead(self, user_id):
+        """Return the stored name/phone/email of a valid session, or None."""
+        if not user_id or not self.is_session_valid(user_id):
+            return None
+        conn = self.connect_db()
+        c = conn.cursor()
+        c.execute("SELECT username, phone_number, email FROM users WHERE user_id=?", (user_id,))
+        row = c.fetchone()
+        conn.close()
+        if not row:
+            return None
+        return {"name": row[0], "phone": row[1], "email": row[2]}
+
+    @metrics.time_function(DB_QUERY_SECONDS, operation="add_llm_calls_avoided")
+    def add_llm_calls_avoided(self, user_id, count):
+        conn = self.connect_db()
+        c = conn.cursor()
+        c.execute("UPDATE users SET llm_calls_avoided = COALESCE(llm_calls_avoided, 0) + ? WHERE user_id = ?",
+                  (count, user_id))
+        conn.commit()
+        conn.close()
+
+    # -------------------------------
+    # Leads
+    # -------------------------------
+    @metrics.time_function(DB_QUERY_SECONDS, operation="record_lead")
+    def record_lead(self, lead, source, session_id=None):
+        """Upsert one lead into the leads table; leads without a phone or email are ignored."""
+        conn = self.connect_db()
+        try:
+            lead_id = leadstore.upsert(conn, lead, source, session_id)
+            conn.commit()
+        finally:
+            conn.close()
+        if lead_id is not None:
+            LEADS_RECORDED.inc(source=source)
+        return lead_id
+
+    def record_session_lead(self, user_id):
+        """Copy the details stored for a session into the leads table.
+
+        Failures are logged, not raised: the chat turn must not fail because
+        the leads table is busy, and the extraction worker records it later.
+        """
+        try:
+            conn = self.connect_db()
+            c = conn.cursor()
+            c.execute("SELECT username, phone_number, email, pain_points FROM users WHERE user_id=?", (user_id,))
+            row = c.fetchone()
+            conn.close()
+            if row:
+                self.record_lead({"name": row[0], "phone": row[1], "email": row[2], "pain_points": row[3]},
+                                 "chat", user_id)
+        except sqlite3.Error as e:
+            print(f"Could not record the lead of session {user_id}: {e}")
+
+    def import_contact_files(self):
+        """One-time import of the contacts/lead_*.json files written before the leads table."""
+        conn = self.connect_db()
+        try:
+            imported = leadstore.import_contacts(conn, self.config["CONTACTS_FOLDER"])
+        finally:
+            conn.close()
+        if imported:
+            print(f"Imported {imported} contact files into the leads table")
+        return imported
+
+    # -------------------------------
+    # Conversations and Contacts Folders
+    # -------------------------------
+    def ensure_folders(self):
+        for folder in (self.config["CONVERSATIONS_FOLDER"], self.config["CONTACTS_FOLDER"]):
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+
+    def load_shared_history(self, now):
+        """Return (path, messages) of the newest conversation file of the last 24 hours."""
+        latest_path = latest_file_in_last_24h(self.config["CONVERSATIONS_FOLDER"],
+                                              now - datetime.timedelta(hours=24))
+        if latest_path is None:
+            return None, []
+        with metrics.timer(FILE_IO_SECONDS, operation="read", kind="conversation"):
+            with open(latest_path, "r", encoding="utf-8") as f:
+                return latest_path, json.load(f)
+
+    # -------------------------------
+    # Routes
+    # -------------------------------
+    def chat(self):
+        data = request.get_json()
+        user_query = data.get("user_query", "").strip()
+        session_id = data.get("session_id", None)
+
+        if not user_query:
+            return jsonify({"error": "No user query provided"}), 400
+
+        # Create or get the user_id first
+        with tracing.span("db.session"):
+            user_id = self.get_or_create_user_id(session_id)
+            lead = self.get_session_lead(user_id) or {}
+
+        # Lead capture always looks at this session's own turns; the model
+        # sees the history of HISTORY_MODE
+        now = datetime.datetime.now()
+        with tracing.span("history.load"):
+            session_history = self.get_conversation_history_from_db(user_id)
+            if self.config["HISTORY_MODE"] == "file":
+                latest_path, combined_history = self.load_shared_history(now)
+            else:
+                latest_path, combined_history = None, list(session_history)
+
+        # Scripted lead-capture turns (greeting, asking for Name and Mobile,
+        # reminders) are answered locally; the model only sees real questions
+        turn = None
+        require_user_details = leadcapture.state(lead) != leadcapture.COMPLETE
+        if self.config["LEAD_CAPTURE"]:
+            last = session_history[-1] if session_history else {}
+            previous_reply = last.get("content") if last.get("role") == "assistant" else None
+            turn = leadcapture.next_turn(user_query, lead, first_turn=not session_history,
+                                         bot_name=self.config["BOT_NAME"], previous_reply=previous_reply)
+            # Once Name and Mobile are on record the prompt stops asking for them
+            require_user_details = leadcapture.state(dict(lead, **turn.details)) != leadcapture.COMPLETE
+
+        # Append the new user query
+        combined_history.append({"role": "user", "content": user_query})
+
+        degraded = False
+        user_info = {}
+        if turn is not None and turn.reply is not None:
+            reply, answered_by = turn.reply, "lead_capture"
+            user_info = dict(turn.details)
+            combined_history.append({"role": "assistant", "content": reply})
+            LEAD_CAPTURE_TURNS.inc(kind=turn.kind)
+        else:
+            # Call LLM; while it is unavailable answer without it
+            try:
+                with tracing.span("llm.reply"):
+                    reply = self.call_llm_api(combined_history, require_user_details=require_user_details)
+            except LLMUnavailable as e:
+                print(f"Model unavailable, serving a degraded reply: {e}")
+                reply, degraded = self.degraded_reply(user_query), True
+            except Exception as e:
+                return jsonify({"error": str(e)}), 500
+            answered_by = None if degraded else "model"
+
+            answer = reply
+            if turn is not None and turn.follow_up and not degraded:
+                reply = f"{reply}\n\n{turn.follow_up}"
+
+            # Degraded replies are shown but never stored as assistant turns, so they
+            # don't end up in the model's history or in lead extraction
+            if not degraded:
+                combined_history.append({"role": "assistant", "content": reply})
+
+                # Extract user info *before* saving conversation
+                try:
+                    user_info = self.extract_lead_details_from_conversation(combined_history)
+                    self.remember_reply(user_id, user_query, answer, lead, user_info, turn and turn.details)
+                except LLMUnavailable as e:
+                    print(f"Lead extraction skipped: {e}")
+            if turn is not None:
+                # Details typed next to the question were already validated locally,
+                # so they win over whatever the extraction model read from them
+                user_info = dict({key: value for key, value in user_info.items() if value}, **turn.details)
+
+        with tracing.span("db.update_user"):
+            self.update_user_info(user_id,
+                                  username=user_info.get("name"),
+                                  phone_number=user_info.get("phone"),
+                                  email=user_info.get("email"),
+                                  pain_points=user_info.get("pain_points"))
+            if any(user_info.values()):
+                self.record_session_lead(user_id)
+            if turn is not None and turn.reply is not None:
+                self.add_llm_calls_avoided(user_id, LLM_CALLS_PER_TURN)
+                LLM_CALLS_AVOIDED.inc(LLM_CALLS_PER_TURN)
+
+        # Save to DB
+        with tracing.span("db.save_conversation"):
+            self.save_conversation(user_id, user_query, None if degraded else reply, answered_by)
+
+        # Save conversation file (read by the lead extraction process)
+        if not latest_path:
+            name = f"chat_{now.strftime('%Y%m%d_%H%M%S')}.json"
+            if self.config["HISTORY_MODE"] == "session":
+                name = f"chat_{user_id}_{now.strftime('%Y%m%d_%H%M%S')}.json"
+            latest_path = os.path.join(self.config["CONVERSATIONS_FOLDER"], name)
+        with tracing.span("file.write_conversation"), \
+                metrics.timer(FILE_IO_SECONDS, operation="write", kind="conversation"):
+            write_json_file(latest_path, combined_history)
+
+        response = {
+            "reply": reply,
+            "session_id": user_id
+        }
+        if degraded:
+            response["degraded"] = True
+        return jsonify(response)
+
+    # -------------------------------
+    # Lead Extraction Background Process
+    # -------------------------------
+    def lead_extraction_process(self):
+        processed_files = {}  # key: filename, value: last processed modification timestamp
+
+        while True:
+            self.run_lead_extraction_once(processed_files)
+            # Wait before checking again (e.g., 10 seconds)
+            time.sleep(self.config["LEAD_POLL_SECONDS"])
+
+    def run_lead_extraction_once(self, processed_files):
+        """Extract leads from every new or updated conversation file; returns how many."""
+        pending = {}    # key: filename, value: conversation
+        mod_times = {}  # key: filename, value: modification timestamp when read
+        for file in os.listdir(self.config["CONVERSATIONS_FOLDER"]):
+            if file.endswith(".json"):
+                filepath = os.path.join(self.config["CONVERSATIONS_FOLDER"], file)
+                try:
+                    # Get the file's current modification time
+                    mod_time = os.path.getmtime(filepath)
+
+                    # Check if this file has not been processed or has been updated
+                    if file not in processed_files or mod_time > processed_files[file]:
+                        with open(filepath, "r", encoding="utf-8") as f:
+                            pending[file] = [message for message in json.load(f) if not is_error_reply(message)]
+                        mod_times[file] = mod_time
+                except Exception as e:
+                    print(f"Error processing {file}: {e}")
+
+        if not pending:
+            return 0
+
+        trace = tracing.start_trace("lead_extraction")
+        trace.root.attrs["files"] = len(pending)
+        try:
+            # Extract lead details using the LLM, several conversations per call
+            if self.config["LEAD_BATCH_SIZE"] > 1:
+                leads = self.extract_lead_details_batch(pending)
+            else:
+                leads = {}
+                try:
+                    for file, conversation in pending.items():
+                        leads[file] = self.extract_lead_details_from_conversation(conversation)
+                        LEAD_EXTRACTION_CALLS.inc(mode="single")
+                except LLMUnavailable as e:
+                    print(f"Model unavailable, leaving {len(pending) - len(leads)} conversations for later: {e}")
+
+            for file, lead in leads.items():
+                try:
+                    with tracing.span("db.record_lead"):
+                        lead_id = self.record_lead(lead, "extraction")
+                    if lead_id is not None:
+                        print(f"[{datetime.datetime.now()}] Extracted lead {lead_id} from {file}")
+                    if lead.get("name") and lead.get("phone") and self.config["CONTACT_FILES"]:
+                        contact_file = os.path.join(self.config["CONTACTS_FOLDER"], f"lead_{file}")
+                        with tracing.span("file.write_contact"), \
+                                metrics.timer(FILE_IO_SECONDS, operation="write", kind="contact"):
+                            write_json_file(contact_file, lead)
+                    elif lead_id is None:
+                        print(f"[{datetime.datetime.now()}] Lead details not complete in {file}.")
+
+                    # Update processed_files with the modification time we read
+                    processed_files[file] = mod_times[file]
+                except Exception as e:
+                    print(f"Error processing {file}: {e}")
+        finally:
+            tracing.finish_trace(trace)
+        return len(leads)
+
+    def metrics_endpoint(self):
+        if not metrics.METRICS_ENABLED:
+            return jsonify({"error": "Metrics are disabled"}), 404
+        return Response(metrics.render_prometheus(), content_type=metrics.CONTENT_TYPE)
+
+    def index(self):
+        return render_template('modified_ui.html')
+
+    def export_leads(self):
+        """Stream the leads table as CSV or Parquet.
+
+        Needs "Authorization: Bearer <ADMIN_TOKEN from secrets.json>". The token
+        is not accepted in the query string, where access logs and browser
+        history would keep it.
+        """
+        token = self.get_secrets().get("ADMIN_TOKEN")
+        if not token:
+            return jsonify({"error": "Lead export is disabled"}), 404
+        given = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if not hmac.compare_digest(given.encode(), token.encode()):
+            return jsonify({"error": "Unauthorized"}), 401
+        fmt = request.args.get("format", "csv")
+        if fmt not in leadstore.EXPORT_FORMATS:
+            return jsonify({"error": f"format must be one of {', '.join(leadstore.EXPORT_FORMATS)}"}), 400
+        if fmt == "parquet" and leadstore.pyarrow is None:
+            return jsonify({"error": "Parquet export needs the pyarrow package"}), 501
+
+        self.connect_db().close()  # make sure the schema exists
+        filename = f"leads-{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+        return Response(leadstore.stream_export(self.config["DB_PATH"], fmt, self.config["EXPORT_CHUNK_SIZE"]),
+                        content_type=leadstore.EXPORT_FORMATS[fmt],
+                        headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+    # -------------------------------
+    # Static site
+    # -------------------------------
+    def site_asset(self, filename):
+        return send_precompressed(os.path.join(self.config["SITE_FOLDER"], "assets"), filename,
+                                  self.config["ASSET_MAX_AGE"], immutable=True)
+
+    def site_page(self, page):
+        # Pages keep their names, so they are revalidated on every visit
+        return send_precompressed(self.config["SITE_FOLDER"], page + ".html", 0)
+
+    def site_image(self, filename):
+        folder = os.path.abspath(self.config["IMAGE_FOLDER"])
+        if not os.path.isfile(os.path.join(folder, filename)):
+            abort(404)
+        immutable = HASHED_IMAGE_RE.fullmatch(filename) is not None
+        response = send_from_directory(folder, filename,
+                                       max_age=self.config["ASSET_MAX_AGE"] if immutable
+                                       else self.config["IMAGE_MAX_AGE"])
+        response.cache_control.public = True
+        if immutable:
+            response.cache_control.immutable = True
+        return response
+
+    def blueprint(self):
+        bp = Blueprint("chatbot", __name__)
+        bp.add_url_rule('/chat', view_func=self.chat, methods=['POST'])
+        bp.add_url_rule('/metrics', view_func=self.metrics_endpoint)
+        bp.add_url_rule('/', view_func=self.index)
+        bp.add_url_rule('/leads/export', view_func=self.export_leads)
+        if self.config["SITE_FOLDER"]:
+            bp.add_url_rule('/assets/<path:filename>', view_func=self.site_asset)
+            bp.add_url_rule('/<page>.html', view_func=self.site_page)
+        if self.config["IMAGE_FOLDER"]:
+            bp.add_url_rule('/img/<path:filename>', view_func=self.site_image)
+        return bp
+
+    # -------------------------------
+    # App Factory
+    # -------------------------------
+    def warm_up(self):
+        """Load everything a chat request needs so the first request isn't slow."""
+        self.ensure_folders()
+        self.init_db()
+        self.import_contact_files()
+        for endpoint in self.get_llm_router().endpoints:
+            endpoint.client
+        self.get_company_info_text()
+        self.build_system_message()
+        self.build_system_message(require_user_details=False)
+
+    def create_app(self, config=None):
+        # Each call starts from the defaults, not from the previous call's overrides
+        self.config.clear()
+        self.config.update(copy.deepcopy(self.defaults), **(config or {}))
+        if self.config["HISTORY_MODE"] not in HISTORY_MODES:
+            raise ValueError(f"HISTORY_MODE must be one of {', '.join(HISTORY_MODES)}")
+        if self.config["LEAD_RULES"] not in LEAD_RULE_SETS:
+            raise ValueError(f"LEAD_RULES must be one of {', '.join(LEAD_RULE_SETS)}")
+        self._reset()
+        self.load_faq_replies()
+
+        app = Flask(__name__, template_folder=os.path.abspath(self.config["TEMPLATE_FOLDER"]))
+        app.secret_key = os.urandom(24) # "42c49afbd77de45bb67d01c4278a9b24"  # not strictly used now
+        CORS(app, supports_credentials=True)
+        tracing.init_app(app)
+        app.register_blueprint(self.blueprint())
+
+        self.ensure_folders()
+        if self.config["WARM_UP"]:
+            self.warm_up()
+        return app
+
+    def run(self, host='0.0.0.0', port=5000):
+        """Serve with Flask's development server plus a lead extraction thread (python app.py)."""
+        # Initialize the database, Bedrock client and document text up front
+        app = self.create_app({"WARM_UP": True})
+
+        # Start the lead extraction process in a separate thread
+        lead_thread = threading.Thread(target=self.lead_extraction_process, daemon=True)
+        lead_thread.start()
+
+        # Start the Flask app
+        app.run(host=host, port=port)
@@ -0,0 +1,237 @@
+"""
+Scripted lead-capture turns, answered without the model.
+
+Every session starts the way the system prompt prescribes: greet, ask for
+Name and Mobile Number, remind the visitor if they don't share them. Those
+turns only depend on which details are already on record, so next_turn()
+produces them locally and validates the phone number and email on the way.
+The model is only needed once the visitor asks a real question.
+
+A message with nothing but a short name in it ("Rahul Sharma") is only
+taken as the name when the previous bot turn asked for it, or when a valid
+phone number stands next to it ("Priya 9123456780").
+"""
+import re
+
+PHONE_RE = re.compile(r"(?<![\w+])\+?\d[\d\s().-]{3,}\d(?!\w)")
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)*\.[A-Za-z]{2,}")
+EMAIL_LIKE_RE = re.compile(r"\S+@\S*")
+NAME_WORD_RE = re.compile(r"[A-Za-z][A-Za-z.'-]*")
+NAME_INTRO_RE = re.compile(
+    r"\b(?:my name is|name is|name\s*[:-]|i am|i'm|im|this is|call me)\s+([A-Za-z][A-Za-z.'-]*(?:\s+[A-Za-z][A-Za-z.'-]*){0,2})",
+    re.IGNORECASE)
+# Filler around shared details ("my number is ...") that is not a question
+DETAIL_WORDS_RE = re.compile(
+    r"\b(?:my|name|email|e-mail|mail|id|phone|mobile|number|no|contact|whatsapp|is|and|it's|its|here)\b",
+    re.IGNORECASE)
+# Phrasings that only say how or where to reach the visitor ("call me at ...",
+# "I am from Delhi, ..."); the place is not kept
+CONTACT_PHRASE_RE = re.compile(
+    r"\b(?:(?:please\s+|you\s+can\s+)?(?:call|reach|contact|text|ping|message|whatsapp|ring)\s+me"
+    r"(?:\s+back)?(?:\s+(?:at|on|via))?"
+    r"|(?:(?:i\s+am|i'm|im)\s+)?(?:from|based\s+in|located\s+in)\s+[A-Za-z]+(?:\s+[A-Za-z]+)?)\b",
+    re.IGNORECASE)
+
+GREETINGS = {"hi", "hii", "hello", "hey", "hey there", "hi there", "hello there", "good morning",
+             "good afternoon", "good evening", "namaste", "yo"}
+THANKS = {"thanks", "thank you", "thank you so much", "thanks a lot", "ok", "okay", "ok thanks",
+          "okay thanks", "great", "cool", "nice", "got it", "fine", "sure"}
+# Words that follow "I am" / "this is" without being a name
+NOT_NAMES = {"a", "an", "the", "not", "just", "here", "from", "with", "and", "interested", "looking",
+             "trying", "asking", "new", "good", "fine", "ok", "okay", "sorry", "sure", "very", "also",
+             "calling", "writing", "searching", "planning", "having", "working", "going", "in", "at",
+             "on", "for", "to", "hi", "hello", "hey", "what", "how", "why", "when", "where", "which",
+             "who", "can", "could", "do", "does", "is", "are", "my", "your", "it", "that", "this",
+             "back", "later", "now", "soon", "today", "tomorrow", "please", "available", "able", "unable",
+             "free", "busy", "done", "ready", "glad", "happy", "curious", "confused", "yes", "no"}
+# Everyday words that make a short message a phrase rather than a name ("tell me more")
+PHRASE_WORDS = {"me", "more", "tell", "show", "give", "send", "share", "need", "want", "know", "see", "about",
+                "info", "information", "details", "detail", "price", "pricing", "prices", "cost", "fees", "fee",
+                "course", "courses", "service", "services", "product", "products", "demo", "help", "support",
+                "call", "contact", "website", "thanks", "thank", "you", "we", "us", "our", "i", "all", "any",
+                "some", "other", "else", "there", "will", "would", "should", "let", "lets", "go", "get",
+                "don't", "dont", "not", "nothing", "something", "maybe", "later", "whatsapp", "mail", "email",
+                "phone", "mobile", "number", "name", "bye", "goodbye", "welcome", "alright", "right", "wait"}
+
+NAME_PROMPT = "May I have your Name as well?"
+PHONE_PROMPT = "Could you please share your Mobile Number as well?"
+NAME_AND_PHONE_PROMPT = "could you please share your Name and Mobile Number?"
+REMINDER = "I need your Name and Mobile Number to assist you."
+# Bot turns after which a bare short message is read as the visitor's name
+ASKS_FOR_NAME = (NAME_PROMPT, NAME_AND_PHONE_PROMPT, REMINDER)
+
+COMPLETE = "complete"
+COLLECTING = "collecting"
+
+
+class Turn:
+    """Outcome of one visitor message.
+
+    reply is the local answer, or None when the model has to answer.
+    details holds the valid name/phone/email found in the message.
+    follow_up is a detail request to append to the model's answer.
+    """
+
+    __slots__ = ("reply", "kind", "details", "follow_up")
+
+    def __init__(self, reply, kind, details, follow_up=None):
+        self.reply = reply
+        self.kind = kind
+        self.details = details
+        self.follow_up = follow_up
+
+
+def normalize_phone(text):
+    """Return the number as digits (keeping a leading +) if it is a plausible mobile, else None."""
+    digits = re.sub(r"\D", "", text)
+    if not 10 <= len(digits) <= 15:
+        return None
+    return ("+" + digits) if text.strip().startswith("+") else digits
+
+
+def parse_details(message):
+    """Find contact details in a message; returns (details, problems, rest).
+
+    problems lists "phone" / "email" when something looked like one but
+    was not valid; rest is the message with the details removed.
+    """
+    details, problems = {}, []
+    rest = message
+
+    for match in PHONE_RE.finditer(message):
+        phone = normalize_phone(match.group())
+        if phone and "phone" not in details:
+            details["phone"] = phone
+        elif not phone and len(re.sub(r"\D", "", match.group())) >= 5:
+            problems.append("phone")
+        rest = rest.replace(match.group(), " ")
+
+    email = EMAIL_RE.search(rest)
+    if email:
+        details["email"] = email.group()
+        rest = rest.replace(email.group(), " ")
+    elif EMAIL_LIKE_RE.search(rest):
+        problems.append("email")
+        rest = EMAIL_LIKE_RE.sub(" ", rest)
+
+    intro = NAME_INTRO_RE.search(rest)
+    if intro:
+        words = []
+        for word in intro.group(1).split():
+            if word.lower() in NOT_NAMES:
+                break
+            words.append(word.strip(".'-"))
+        if words:
+            details["name"] = " ".join(word.capitalize() for word in words)
+            rest = rest.replace(intro.group(), " ")
+    if details or problems:
+        rest = DETAIL_WORDS_RE.sub(" ", CONTACT_PHRASE_RE.sub(" ", rest))
+    return details, problems, rest
+
+
+def bare_name(rest):
+    """Treat a short leftover such as "Rahul Sharma" as a name."""
+    words = rest.strip(" \t\r\n.,!").replace(",", " ").split()
+    if not 1 <= len(words) <= 3 or not all(NAME_WORD_RE.fullmatch(word) for word in words):
+        return None
+    if " ".join(words).lower() in GREETINGS | THANKS:
+        return None
+    if any(word.lower().strip(".'-") in NOT_NAMES | PHRASE_WORDS for word in words):
+        return None
+    return " ".join(word.strip(".'-").capitalize() for word in words)
+
+
+def asked_for_name(previous_reply):
+    return bool(previous_reply) and previous_reply.rstrip().endswith(ASKS_FOR_NAME)
+
+
+def small_talk(text):
+    """Classify a message with no real content as "greeting" / "thanks", else None."""
+    key = " ".join(re.sub(r"[^\w\s']", " ", text.lower()).split())
+    if not key:
+        return "thanks"
+    if key in GREETINGS:
+        return "greeting"
+    if key in THANKS:
+        return "thanks"
+    return None
+
+
+def is_question(message):
+    """True when a message carries more than contact details and small talk."""
+    _, _, rest = parse_details(message)
+    return small_talk(rest) is None and not bare_name(rest)
+
+
+def mentions_details(text, lead):
+    """True if text contains a word of the visitor's name, their phone digits or their email."""
+    lowered = text.lower()
+    for word in re.findall(r"[A-Za-z]{2,}", lead.get("name") or ""):
+        if re.search(rf"\b{re.escape(word.lower())}\b", lowered):
+            return True
+    # Digits only, so "+91 98765 43210" matches a stored "9876543210"
+    phone = re.sub(r"\D", "", lead.get("phone") or "")
+    if len(phone) >= 7 and phone[-10:] in re.sub(r"\D", "", text):
+        return True
+    email = (lead.get("email") or "").strip().lower()
+    return bool(email) and email in lowered
+
+
+def state(lead):
+    return COMPLETE if lead.get("name") and lead.get("phone") else COLLECTING
+
+
+def next_turn(message, lead, first_turn, bot_name, previous_reply=None):
+    """Decide how to answer message given the details already on record (lead).
+
+    previous_reply is the bot's last answer in this session, if any.
+    """
+    details, problems, rest = parse_details(message)
+    was_complete = state(lead) == COMPLETE
+    merged = dict(lead, **details)
+
+    # A short leftover is only a name right after we asked for one, or next
+    # to a valid number in the same message ("Priya 9123456780")
+    if not merged.get("name") and (asked_for_name(previous_reply) or "phone" in details):
+        name = bare_name(rest)
+        if name:
+            details["name"] = merged["name"] = name
+            rest = ""
+
+    if was_complete:
+        talk = small_talk(rest)
+        if talk is None:
+            return Turn(None, "question", details)
+        if details:
+            return Turn("Thanks, I've noted that. How else can I help you?", "details_received", details)
+        if talk == "greeting":
+            return Turn(f"Hello again, {merged['name']}! How can I help you today?", "smalltalk", details)
+        return Turn("You're welcome! Is there anything else I can help you with?", "smalltalk", details)
+
+    # Only when the message is mostly the number; "we have 50000 users" is not a phone
+    if "phone" in problems and not merged.get("phone") and small_talk(rest) is not None:
+        return Turn("That doesn't look like a valid mobile number. Could you please check it and share it "
+                    "again, with the country code if you're outside India?", "invalid_phone", details)
+
+    if state(merged) == COMPLETE:
+        # Details plus a real question: let the model answer the question
+        if small_talk(rest) is None:
+            return Turn(None, "question", details)
+        reply = f"Thank you, {merged['name']}! "
+        if "email" in problems:
+            reply += "That email address doesn't look right, you can share it again if you like. "
+        elif not merged.get("email"):
+            reply += "You can also share your Email and Organisation if you like. "
+        return Turn(reply + "How can I help you today?", "details_received", details)
+
+    # Some details plus a real question: answer it and ask for the rest
+    if details and small_talk(rest) is None:
+        return Turn(None, "question", details, follow_up=PHONE_PROMPT if merged.get("name") else NAME_PROMPT)
+
+    if merged.get("name") and not merged.get("phone"):
+        return Turn(f"Thanks, {merged['name']}! {PHONE_PROMPT}", "ask_phone", details)
+    if merged.get("phone") and not merged.get("name"):
+        return Turn(f"Thanks! {NAME_PROMPT}", "ask_name", details)
+    if first_turn:
+        return Turn(f"Hello! I'm {bot_name}. To assist you further, {NAME_AND_PHONE_PROMPT}", "greeting", details)
+    return Turn(REMINDER, "reminder", details)
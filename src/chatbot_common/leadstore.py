@@ -0,0 +1,250 @@
+"""
+One deduplicated leads table, and exports of it.
+
+A lead is keyed on its normalized phone number and its lowercased email;
+upsert() merges a new sighting into the row that shares either key (and
+folds two rows together when a sighting links them), so the same visitor
+coming back in a new session, or found again by the extraction worker,
+stays one lead. Exports read the table in chunks and yield bytes, so they
+can be streamed to a client or a file without holding every row.
+"""
+import io
+import os
+import re
+import csv
+import json
+import sqlite3
+import datetime
+
+try:
+    import pyarrow # type: ignore
+    import pyarrow.parquet # type: ignore
+except ImportError:
+    pyarrow = None
+
+COLUMNS = ("id", "name", "phone", "email", "pain_points", "source", "session_id", "first_seen", "last_seen")
+EXPORT_FORMATS = {"csv": "text/csv; charset=utf-8", "parquet": "application/vnd.apache.parquet"}
+# Spreadsheets run a cell starting with one of these as a formula; lead
+# fields are typed by visitors, so CSV exports quote them (see csv_cell)
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+SCHEMA = '''CREATE TABLE IF NOT EXISTS leads
+             (id INTEGER PRIMARY KEY AUTOINCREMENT,
+              phone_key TEXT UNIQUE,
+              email_key TEXT UNIQUE,
+              name TEXT,
+              phone TEXT,
+              email TEXT,
+              pain_points TEXT,
+              source TEXT,
+              session_id TEXT,
+              first_seen TIMESTAMP,
+              last_seen TIMESTAMP)'''
+IMPORTS_SCHEMA = '''CREATE TABLE IF NOT EXISTS lead_imports
+                    (file TEXT PRIMARY KEY,
+                     imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)'''
+
+
+def init_schema(cursor):
+    cursor.execute(SCHEMA)
+    cursor.execute(IMPORTS_SCHEMA)
+
+
+def phone_key(phone):
+    """Last ten digits, so "+91 98765 43210" and "09876543210" are the same lead."""
+    digits = re.sub(r"\D", "", str(phone or ""))
+    return digits[-10:] if len(digits) >= 10 else None
+
+
+def email_key(email):
+    email = str(email or "").strip().lower()
+    return email if "@" in email else None
+
+
+def upsert(conn, lead, source, session_id=None, seen_at=None):
+    """Insert or merge one lead; returns its row id, or None without a usable phone or email.
+
+    Newer non-empty values win; first_seen keeps the oldest sighting. The
+    caller commits.
+
+    The lookup and the write run in one write transaction (BEGIN IMMEDIATE
+    unless the caller already opened one), so concurrent upserts of the
+    same phone or email from other workers wait instead of both inserting.
+    """
+    phone, email = phone_key(lead.get("phone")), email_key(lead.get("email"))
+    if not phone and not email:
+        return None
+    seen_at = seen_at or datetime.datetime.now().isoformat(timespec="seconds")
+    values = {
+        "name": lead.get("name") or None,
+        "phone": str(lead["phone"]).strip() if phone else None,
+        "email": str(lead["email"]).strip() if email else None,
+        "pain_points": lead.get("pain_points") or None,
+        "source": source,
+        "session_id": session_id,
+    }
+
+    c = conn.cursor()
+    if not conn.in_transaction:
+        c.execute("BEGIN IMMEDIATE")
+    rows = c.execute("SELECT id, first_seen FROM leads WHERE phone_key = ? OR email_key = ? ORDER BY id",
+                     (phone, email)).fetchall()
+    if not rows:
+        c.execute("""
+            INSERT INTO leads (phone_key, email_key, name, phone, email, pain_points, source, session_id,
+                               first_seen, last_seen)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (phone, email, values["name"], values["phone"], values["email"], values["pain_points"],
+              source, session_id, seen_at, seen_at))
+        return c.lastrowid
+
+    keep = rows[0][0]
+    first_seen = min([seen_at] + [row[1] for row in rows if row[1]])
+    for other, _ in rows[1:]:
+        # This sighting links two leads (phone of one, email of the other): fold them together
+        merged = c.execute("SELECT phone_key, email_key, name, phone, email, pain_points FROM leads WHERE id = ?",
+                           (other,)).fetchone()
+        c.execute("DELETE FROM leads WHERE id = ?", (other,))
+        c.execute("""
+            UPDATE leads SET phone_key = COALESCE(phone_key, ?), email_key = COALESCE(email_key, ?),
+                             name = COALESCE(name, ?), phone = COALESCE(phone, ?), email = COALESCE(email, ?),
+                             pain_points = COALESCE(pain_points, ?)
+            WHERE id = ?
+        """, merged + (keep,))
+    c.execute("""
+        UPDATE leads SET phone_key = COALESCE(?, phone_key), email_key = COALESCE(?, email_key),
+                         name = COALESCE(?, name), phone = COALESCE(?, phone), email = COALESCE(?, email),
+                         pain_points = COALESCE(?, pain_points), source = ?,
+                         session_id = COALESCE(?, session_id), first_seen = ?,
+                         last_seen = MAX(COALESCE(last_seen, ''), ?)
+        WHERE id = ?
+    """, (phone, email, values["name"], values["phone"], values["email"], values["pain_points"], source,
+          session_id, first_seen, seen_at, keep))
+    return keep
+
+
+def import_contacts(conn, folder, commit_every=500):
+    """Upsert every contacts/lead_*.json file not imported before; returns how many were imported.
+
+    Files are only read once (tracked in lead_imports), so running this at
+    every start is cheap.
+    """
+    if not os.path.isdir(folder):
+        return 0
+    c = conn.cursor()
+    done = {row[0] for row in c.execute("SELECT file FROM lead_imports")}
+    imported = 0
+    for entry in os.scandir(folder):
+        if not entry.name.endswith(".json") or entry.name in done:
+            continue
+        try:
+            with open(entry.path, "r", encoding="utf-8") as f:
+                lead = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Skipping contact file {entry.name}: {e}")
+            continue
+        seen_at = datetime.datetime.fromtimestamp(entry.stat().st_mtime).isoformat(timespec="seconds")
+        if isinstance(lead, dict):
+            upsert(conn, lead, "contacts_import", seen_at=seen_at)
+        c.execute("INSERT OR IGNORE INTO lead_imports (file) VALUES (?)", (entry.name,))
+        imported += 1
+        if imported % commit_every == 0:
+            conn.commit()
+    conn.commit()
+    return imported
+
+
+# -------------------------------
+# Export
+# -------------------------------
+def iter_chunks(db_path, chunk_size=1000):
+    """Yield lists of row tuples (COLUMNS order) using a connection of its own."""
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(f"SELECT {', '.join(COLUMNS)} FROM leads ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def csv_cell(value):
+    """Prefix text a spreadsheet would run as a formula with a quote, so it stays text."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for rows in chunks:
+        writer.writerows([csv_cell(value) for value in row] for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain."""
+
+    def __init__(self):
+        super().__init__()
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def stream_parquet(chunks):
+    """One row group per chunk; needs pyarrow."""
+    if pyarrow is None:
+        raise RuntimeError("Parquet export needs the pyarrow package")
+    schema = pyarrow.schema([(column, pyarrow.int64() if column == "id" else pyarrow.string())
+                             for column in COLUMNS])
+    sink = _DrainableSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def stream_export(db_path, fmt, chunk_size=1000):
+    chunks = iter_chunks(db_path, chunk_size)
+    return stream_parquet(chunks) if fmt == "parquet" else stream_csv(chunks)
+
+
+def write_export(db_path, path, fmt, chunk_size=1000):
+    """Write an export to path chunk by chunk; returns the number of bytes written."""
+    size = 0
+    with open(path, "wb") as f:
+        for data in stream_export(db_path, fmt, chunk_size):
+            f.write(data)
+            size += len(data)
+    return size
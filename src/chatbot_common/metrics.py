@@ -0,0 +1,399 @@
+import os
+import json
+import bisect
+import threading
+import contextvars
+import time
+from functools import wraps
+
+# -------------------------------
+# Metrics Setup
+# -------------------------------
+# Set METRICS_ENABLED=0 to turn every counter/histogram into a no-op and
+# hide the /metrics endpoint.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+# Labels such as tenant="qbytz" added to every sample recorded in the current
+# context (request thread), so several apps can share one registry.
+_common_labels = contextvars.ContextVar("metrics_common_labels", default=())
+
+
+def set_enabled(enabled):
+    global METRICS_ENABLED
+    METRICS_ENABLED = bool(enabled)
+
+
+def set_common_labels(**labels):
+    """Attach labels to every sample recorded in this context; returns a token for reset_common_labels."""
+    return _common_labels.set(tuple(sorted((name, str(value)) for name, value in labels.items())))
+
+
+def reset_common_labels(token):
+    _common_labels.reset(token)
+
+
+def _key(labelnames, labels):
+    return _common_labels.get(), tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, key, extra=None):
+    common, labelvalues = key
+    pairs = [f'{name}="{_escape(value)}"' for name, value in common + tuple(zip(labelnames, labelvalues))]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# -------------------------------
+# Metric Types
+# -------------------------------
+class Counter:
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = _key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = _key(self.labelnames, labels)
+        return self._values.get(key, 0)
+
+    def items(self):
+        with self._lock:
+            return list(self._values.items())
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = _key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # key: label values, value: [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = _key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels):
+        key = _key(self.labelnames, labels)
+        series = self._series.get(key)
+        return series[-1] if series else 0
+
+    def items(self):
+        with self._lock:
+            return [(key, list(series)) for key, series in self._series.items()]
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key, ("le", "+Inf"))
+            yield f"{self.name}_bucket{labels} {series[-1]}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(series[-2])}"
+            yield f"{self.name}_count{labels} {series[-1]}"
+
+
+def _get_or_create(cls, name, documentation, labelnames, **kwargs):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, documentation, labelnames, **kwargs)
+        return metric
+
+
+def counter(name, documentation, labelnames=()):
+    return _get_or_create(Counter, name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=()):
+    return _get_or_create(Gauge, name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return _get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+# -------------------------------
+# Timers
+# -------------------------------
+class timer:
+    """Context manager that observes the elapsed seconds into a histogram."""
+
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.start = None
+
+    def __enter__(self):
+        if METRICS_ENABLED:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.start is not None:
+            self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def time_function(histogram, **labels):
+    """Decorator form of `timer`; costs a single flag check when disabled."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS_ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+        return wrapper
+    return decorator
+
+
+# -------------------------------
+# Multi-process aggregation
+# -------------------------------
+# Pre-forked workers (serve.py) each have their own registry. Once
+# enable_multiprocess(folder) is called, every process writes a snapshot of
+# its registry to folder/<pid>.json (start_snapshots() every second, and
+# write_snapshot() on exit), and render_prometheus() in any of them merges
+# all snapshots: counters and histograms are summed, gauges get a pid label.
+# The master folds the snapshots of exited workers into folder/exited.json
+# (collect_exited), so recycling a worker never makes a counter go back.
+_multiprocess_dir = None
+EXITED_FILE = "exited.json"
+
+
+def enable_multiprocess(folder):
+    global _multiprocess_dir
+    _multiprocess_dir = folder
+
+
+def reset_values():
+    """Forget every recorded value, e.g. in a forked worker (the master's values are in its own snapshot)."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    for metric in metrics:
+        metric.clear()
+
+
+def _encode_key(key):
+    common, labelvalues = key
+    return json.dumps([[list(pair) for pair in common], list(labelvalues)])
+
+
+def _decode_key(text):
+    common, labelvalues = json.loads(text)
+    return tuple(tuple(pair) for pair in common), tuple(labelvalues)
+
+
+def snapshot():
+    """Every metric's values as {name: {encoded key: value}}."""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return {metric.name: {_encode_key(key): value for key, value in metric.items()} for metric in metrics}
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot():
+    if _multiprocess_dir is None or not METRICS_ENABLED:
+        return
+    _write_json(os.path.join(_multiprocess_dir, f"{os.getpid()}.json"), snapshot())
+
+
+def start_snapshots(interval=1.0):
+    """Write this process's snapshot every interval seconds from a daemon thread."""
+    if _multiprocess_dir is None or not METRICS_ENABLED:
+        return
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write_snapshot()
+            except OSError as e:
+                print(f"Could not write the metrics snapshot: {e}")
+
+    threading.Thread(target=loop, name="metrics-snapshot", daemon=True).start()
+
+
+def _merge(totals, data, pid=None):
+    """Add one snapshot to totals; gauges are kept per pid, and dropped when pid is None."""
+    for name, values in data.items():
+        metric = _registry.get(name)
+        if metric is None:
+            continue
+        merged = totals.setdefault(name, {})
+        for encoded, value in values.items():
+            if isinstance(metric, Gauge):
+                if pid is None:
+                    continue
+                common, labelvalues = _decode_key(encoded)
+                merged[_encode_key((common + (("pid", str(pid)),), labelvalues))] = value
+            elif isinstance(metric, Histogram):
+                current = merged.get(encoded)
+                merged[encoded] = value if current is None else [a + b for a, b in zip(current, value)]
+            else:
+                merged[encoded] = merged.get(encoded, 0) + value
+
+
+def collect_exited(pids):
+    """Fold the snapshots of exited processes into exited.json and remove them (master only)."""
+    if _multiprocess_dir is None or not pids:
+        return
+    exited_path = os.path.join(_multiprocess_dir, EXITED_FILE)
+    exited = _read_json(exited_path) or {"pids": [], "metrics": {}}
+    paths = []
+    for pid in pids:
+        path = os.path.join(_multiprocess_dir, f"{pid}.json")
+        data = _read_json(path)
+        if data is not None:
+            _merge(exited["metrics"], data)
+            exited["pids"].append(pid)
+            paths.append(path)
+    if not paths:
+        return
+    # exited.json names the pids it holds, so a reader never counts them twice
+    _write_json(exited_path, exited)
+    for path in paths:
+        os.remove(path)
+
+
+def _aggregated(metrics):
+    """Copies of metrics holding the merged values of every process's snapshot."""
+    write_snapshot()
+    totals = {}
+    # Live snapshots first, exited.json last: a worker folded in between is then
+    # skipped here and counted from exited.json
+    snapshots = []
+    for filename in os.listdir(_multiprocess_dir):
+        pid = filename[:-len(".json")]
+        if filename.endswith(".json") and pid.isdigit():
+            data = _read_json(os.path.join(_multiprocess_dir, filename))
+            if data is not None:
+                snapshots.append((int(pid), data))
+    exited = _read_json(os.path.join(_multiprocess_dir, EXITED_FILE)) or {"pids": [], "metrics": {}}
+    exited_pids = set(exited["pids"])
+    for pid, data in snapshots:
+        if pid not in exited_pids:
+            _merge(totals, data, pid)
+    _merge(totals, exited["metrics"])
+
+    copies = []
+    for metric in metrics:
+        if isinstance(metric, Histogram):
+            copy = Histogram(metric.name, metric.documentation, metric.labelnames, metric.buckets)
+            copy._series = {_decode_key(key): value for key, value in totals.get(metric.name, {}).items()}
+        else:
+            copy = type(metric)(metric.name, metric.documentation, metric.labelnames)
+            copy._values = {_decode_key(key): value for key, value in totals.get(metric.name, {}).items()}
+        copies.append(copy)
+    return copies
+
+
+# -------------------------------
+# Exposition
+# -------------------------------
+def render_prometheus():
+    """Render every registered metric in the Prometheus text format (of every process, see enable_multiprocess)."""
+    with _registry_lock:
+        metrics = sorted(_registry.values(), key=lambda m: m.name)
+    if _multiprocess_dir is not None:
+        metrics = _aggregated(metrics)
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+        lines.append(f"# TYPE {metric.name} {metric.type_name}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,170 @@
+"""
+Health-scored routing across Bedrock inference profiles, plus hedging.
+
+secrets.json may list several profiles (regions or cross-region inference
+profiles). Keys a profile leaves out, such as the AWS credentials, are
+taken from the top level. Without BEDROCK_PROFILES the top-level
+INFERENCE_PROFILE_ARN / REGION form the only profile:
+
+    "BEDROCK_PROFILES": [
+        {"name": "use1", "INFERENCE_PROFILE_ARN": "arn:...", "REGION": "us-east-1"},
+        {"name": "usw2", "INFERENCE_PROFILE_ARN": "arn:...", "REGION": "us-west-2",
+         "BEDROCK_ENDPOINT_URL": "http://127.0.0.1:8002"}
+    ]
+
+A profile may also name a faster, cheaper model for light calls (see the
+apps' LLM_TIERS) as LIGHT_INFERENCE_PROFILE_ARN; without it light calls use
+INFERENCE_PROFILE_ARN.
+"""
+import time
+import queue
+import random
+import threading
+from collections import deque
+
+from . import tracing
+
+
+def load_profiles(secrets):
+    """Return one merged settings dict per configured inference profile."""
+    shared = {key: value for key, value in secrets.items() if key != "BEDROCK_PROFILES"}
+    profiles = []
+    for index, profile in enumerate(secrets.get("BEDROCK_PROFILES") or [{}]):
+        merged = dict(shared, **profile)
+        merged.setdefault("name", f"{merged.get('REGION', 'profile')}-{index}")
+        profiles.append(merged)
+    return profiles
+
+
+class Endpoint:
+    """One inference profile with a lazily built client and rolling health stats."""
+
+    def __init__(self, profile, client_factory, window=200, min_samples=20):
+        self.profile = profile
+        self.name = profile["name"]
+        self.model_id = profile["INFERENCE_PROFILE_ARN"]
+        self.model_ids = {"default": self.model_id,
+                          "light": profile.get("LIGHT_INFERENCE_PROFILE_ARN") or self.model_id}
+        self.min_samples = min_samples
+        self._client_factory = client_factory
+        self._client = None
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.latency_ewma = None
+        self.failure_ewma = 0.0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def model_for(self, tier):
+        """Model id for a model tier ("default" or "light")."""
+        return self.model_ids.get(tier, self.model_id)
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._client_factory(self.profile)
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    def available(self, now=None):
+        return (now if now is not None else time.monotonic()) >= self.cooldown_until
+
+    def score(self):
+        """Lower is better: smoothed latency plus a penalty for recent failures.
+
+        Profiles without samples score 0 so they get tried.
+        """
+        latency = self.latency_ewma if self.latency_ewma is not None else 0.0
+        return latency + 10.0 * self.failure_ewma
+
+    def record_success(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+            self.latency_ewma = seconds if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * seconds
+            self.failure_ewma *= 0.8
+            self.consecutive_failures = 0
+
+    def record_failure(self, cooldown=True):
+        """Count a throttle or error; with cooldown, take the profile out of rotation for a while."""
+        with self._lock:
+            self.failure_ewma = 0.8 * self.failure_ewma + 0.2
+            self.consecutive_failures += 1
+            if cooldown:
+                seconds = min(30.0, 2 ** (self.consecutive_failures - 1)) + random.uniform(0, 1)
+                self.cooldown_until = time.monotonic() + seconds
+
+    def p95(self):
+        """95th percentile of recent successful latencies, or None with too few samples."""
+        with self._lock:
+            samples = sorted(self.latencies)
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+class Router:
+    """Pick the healthiest available profile, exploring the others now and then."""
+
+    def __init__(self, endpoints, explore=0.05):
+        self.endpoints = list(endpoints)
+        self.explore = explore
+
+    def choose(self, exclude=()):
+        """Return the best endpoint not in exclude, or None if there is none.
+
+        When every candidate is cooling down, the one that recovers first is
+        returned; the caller decides whether to wait for it.
+        """
+        candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+        if not candidates:
+            return None
+        now = time.monotonic()
+        healthy = [endpoint for endpoint in candidates if endpoint.available(now)]
+        if not healthy:
+            return min(candidates, key=lambda endpoint: endpoint.cooldown_until)
+        if len(healthy) > 1 and random.random() < self.explore:
+            return random.choice(healthy)
+        # min() keeps the first of equal scores, so secrets.json order is the tie-break
+        return min(healthy, key=Endpoint.score)
+
+
+def hedged_call(primary, backup, delay):
+    """Run primary(); if it hasn't finished after delay seconds also run backup().
+
+    Returns (result, winner, hedged): winner is 0 for primary and 1 for
+    backup, hedged tells whether backup was started. The first successful
+    result wins; an error is raised only when every started call failed.
+    The slower call is left to finish in the background.
+    """
+    results = queue.Queue()
+
+    def run(index, func):
+        try:
+            results.put((index, func(), None))
+        except Exception as e:
+            results.put((index, None, e))
+
+    # Each call runs in a copy of the caller's context so metric labels carry
+    # over, minus the request trace: both calls may still be running when the
+    # request opens its next spans
+    threading.Thread(target=tracing.detached_context().run, args=(run, 0, primary), daemon=True).start()
+    started, received, first_error = 1, 0, None
+    while True:
+        try:
+            index, result, error = results.get(timeout=delay if started == 1 else None)
+        except queue.Empty:
+            threading.Thread(target=tracing.detached_context().run, args=(run, 1, backup), daemon=True).start()
+            started = 2
+            continue
+        received += 1
+        if error is None:
+            return result, index, started == 2
+        if first_error is None:
+            first_error = error
+        if received == started:
+            raise first_error
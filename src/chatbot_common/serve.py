@@ -0,0 +1,261 @@
+"""
+Pre-fork production server, started through each app's serve.py:
+
+    python serve.py --workers 4 --port 5000 --max-requests 2000
+
+The master process builds the app with warm_up() (DB schema, Bedrock
+client, PDF text and system prompts), freezes the garbage collector so
+those objects stay on copy-on-write pages, binds the listening socket and
+forks the HTTP workers plus one lead-extraction worker. Every worker shares
+the preloaded knowledge instead of re-parsing document.pdf.
+
+Signals to the master:
+    TERM / INT   graceful shutdown (workers finish in-flight requests)
+    HUP          rolling restart of the HTTP workers, one at a time
+
+Workers are also recycled after --max-requests (+ random jitter) requests.
+The master never calls Bedrock itself, so no HTTP connections are shared
+across fork.
+
+/metrics on any worker reports every process: each one writes a snapshot
+of its metrics to --metrics-dir (a fresh temporary folder by default) and
+the answering worker merges them, including the master's warm-up timings
+and the lead worker's extraction metrics (see metrics.enable_multiprocess).
+"""
+import os
+import gc
+import sys
+import time
+import random
+import shutil
+import signal
+import socket
+import argparse
+import tempfile
+import threading
+
+from werkzeug.serving import make_server # type: ignore
+
+from . import metrics
+
+
+# -------------------------------
+# Worker
+# -------------------------------
+def run_http_worker(application, sock, host, max_requests):
+    state = {"stopping": False, "served": 0}
+    lock = threading.Lock()
+
+    def stop(signum, frame):
+        state["stopping"] = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    def counted_app(environ, start_response):
+        with lock:
+            state["served"] += 1
+        return application(environ, start_response)
+
+    server = make_server(host, sock.getsockname()[1], counted_app, threaded=True, fd=sock.fileno())
+    server.daemon_threads = False  # so server_close() waits for in-flight requests
+    server.timeout = 0.5
+    while not state["stopping"] and not (max_requests and state["served"] >= max_requests):
+        server.handle_request()
+    server.server_close()
+
+
+def run_lead_worker(target):
+    def stop(signum, frame):
+        metrics.write_snapshot()
+        os._exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    target()
+
+
+# -------------------------------
+# Master
+# -------------------------------
+class Master:
+    def __init__(self, application, sock, host, workers, max_requests=0, max_requests_jitter=0,
+                 graceful_timeout=30.0, lead_worker=None):
+        self.application = application
+        self.sock = sock
+        self.host = host
+        self.num_workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.lead_worker = lead_worker  # lead extraction loop run in its own process, or None
+        self.http_workers = {}  # pid -> spawn time
+        self.lead_pid = None
+        self.stopping = False
+        self.reload_requested = False
+
+    def _fork(self, target, *args):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            # The master's own values are already in its snapshot
+            metrics.reset_values()
+            metrics.start_snapshots()
+            try:
+                target(*args)
+            except BaseException as e:
+                print(f"[worker {os.getpid()}] crashed: {e}", file=sys.stderr)
+                exit_code = 1
+            finally:
+                try:
+                    metrics.write_snapshot()
+                except OSError:
+                    pass
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(exit_code)
+        return pid
+
+    def spawn_http_worker(self):
+        max_requests = self.max_requests
+        if max_requests and self.max_requests_jitter:
+            max_requests += random.randint(0, self.max_requests_jitter)
+        pid = self._fork(run_http_worker, self.application, self.sock, self.host, max_requests)
+        self.http_workers[pid] = time.time()
+        return pid
+
+    def spawn_lead_worker(self):
+        self.lead_pid = self._fork(run_lead_worker, self.lead_worker)
+
+    def handle_stop(self, signum, frame):
+        self.stopping = True
+
+    def handle_reload(self, signum, frame):
+        self.reload_requested = True
+
+    def reap(self):
+        """Collect exited children; returns the pids that exited."""
+        exited = []
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            exited.append(pid)
+            self.http_workers.pop(pid, None)
+            if pid == self.lead_pid:
+                self.lead_pid = None
+        metrics.collect_exited(exited)
+        return exited
+
+    def rolling_restart(self):
+        """Replace HTTP workers one at a time so capacity never drops to zero."""
+        for pid in list(self.http_workers):
+            if self.stopping:
+                return
+            self.spawn_http_worker()
+            self.terminate([pid])
+
+    def terminate(self, pids):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.time() + self.graceful_timeout
+        remaining = set(pids)
+        while remaining and time.time() < deadline:
+            remaining -= set(self.reap())
+            remaining = {pid for pid in remaining if self._alive(pid)}
+            time.sleep(0.05)
+        for pid in remaining:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.reap()
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGHUP, self.handle_reload)
+
+        for _ in range(self.num_workers):
+            self.spawn_http_worker()
+        if self.lead_worker:
+            self.spawn_lead_worker()
+        print(f"[master {os.getpid()}] serving on {self.host}:{self.sock.getsockname()[1]} "
+              f"with workers {sorted(self.http_workers)}", flush=True)
+
+        while not self.stopping:
+            self.reap()
+            if self.reload_requested:
+                self.reload_requested = False
+                self.rolling_restart()
+            while not self.stopping and len(self.http_workers) < self.num_workers:
+                self.spawn_http_worker()
+            if self.lead_worker and self.lead_pid is None and not self.stopping:
+                self.spawn_lead_worker()
+            time.sleep(0.2)
+
+        children = list(self.http_workers) + ([self.lead_pid] if self.lead_pid else [])
+        self.terminate(children)
+        self.sock.close()
+
+
+def create_listener(host, port, backlog=2048):
+    sock = socket.create_server((host, port), backlog=backlog)
+    # Non-blocking so a worker that loses the accept() race returns to its loop
+    sock.setblocking(False)
+    sock.set_inheritable(True)
+    return sock
+
+
+def main(chatbot):
+    """Serve chatbot, a chatbot.Chatbot (or anything with create_app() and lead_extraction_process())."""
+    parser = argparse.ArgumentParser(description="Pre-fork server for the chatbot app.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--max-requests", type=int, default=0, help="recycle a worker after N requests (0 = never)")
+    parser.add_argument("--max-requests-jitter", type=int, default=0)
+    parser.add_argument("--graceful-timeout", type=float, default=30.0)
+    parser.add_argument("--no-lead-worker", action="store_true", help="do not run lead extraction")
+    parser.add_argument("--metrics-dir", help="folder for the per-process metrics snapshots "
+                                              "(default: a temporary folder removed on exit)")
+    args = parser.parse_args()
+
+    metrics_dir = args.metrics_dir or tempfile.mkdtemp(prefix="chatbot-metrics-")
+    os.makedirs(metrics_dir, exist_ok=True)
+    for filename in os.listdir(metrics_dir):
+        if filename.endswith(".json"):  # left by an earlier run, whose pids may be reused
+            os.remove(os.path.join(metrics_dir, filename))
+    metrics.enable_multiprocess(metrics_dir)
+
+    # Preload everything workers need, then keep it out of the GC's reach so
+    # collections in the workers don't dirty the shared pages.
+    application = chatbot.create_app({"WARM_UP": True})
+    metrics.write_snapshot()
+    gc.collect()
+    gc.freeze()
+
+    sock = create_listener(args.host, args.port)
+    lead_worker = None if args.no_lead_worker else chatbot.lead_extraction_process
+    try:
+        Master(application, sock, args.host, args.workers, args.max_requests, args.max_requests_jitter,
+               args.graceful_timeout, lead_worker=lead_worker).run()
+    finally:
+        if not args.metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
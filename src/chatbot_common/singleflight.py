@@ -0,0 +1,71 @@
+import hashlib
+import threading
+
+
+class SingleFlightTimeout(Exception):
+    """Raised to a waiter whose identical in-flight call did not finish in time."""
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait for and share its result, or re-raise
+    its exception. Coalescing only happens within one process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, timeout=None):
+        """Return (result, shared) where shared is True for coalesced waiters."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if leader:
+            try:
+                call.result = func()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.event.set()
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+
+        if not call.event.wait(timeout):
+            raise SingleFlightTimeout(f"Timed out after {timeout}s waiting for an identical request")
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+def payload_key(*parts):
+    """Stable hash of the request parts (model id, serialized body, ...)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8") if isinstance(part, str) else part)
+        digest.update(b"\0")
+    return digest.hexdigest()
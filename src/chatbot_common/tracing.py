@@ -0,0 +1,250 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import datetime
+import threading
+import contextvars
+from collections import Counter
+
+# -------------------------------
+# Tracing Setup
+# -------------------------------
+# Requests slower than SLOW_REQUEST_MS are written as one JSON line to
+# SLOW_REQUEST_LOG. PROFILING_ENABLED=1 lets a request ask for a sampling
+# profile with the "X-Profile: 1" header.
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "5000"))
+SLOW_REQUEST_LOG = os.environ.get("SLOW_REQUEST_LOG", "slow_requests.log")
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+PROFILES_FOLDER = os.environ.get("PROFILES_FOLDER", "profiles")
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.005"))
+
+_REQUEST_ID_RE = re.compile(r"[A-Za-z0-9._-]{1,64}")
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_log_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "attrs", "children")
+
+    def __init__(self, name, attrs=None):
+        self.name = name
+        self.start = time.perf_counter()
+        self.end = None
+        self.attrs = attrs or {}
+        self.children = []
+
+    @property
+    def duration_ms(self):
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000.0
+
+    def to_dict(self, origin):
+        data = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000.0, 3),
+            "duration_ms": round(self.duration_ms, 3),
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.children:
+            data["spans"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+class Trace:
+    def __init__(self, name, request_id=None):
+        self.request_id = request_id or uuid.uuid4().hex
+        self.root = Span(name)
+        self.stack = [self.root]
+        self.started_at = datetime.datetime.now()
+        self.profiler = None
+
+    @property
+    def duration_ms(self):
+        return self.root.duration_ms
+
+    def iter_spans(self):
+        pending = list(self.root.children)
+        while pending:
+            current = pending.pop(0)
+            yield current
+            pending.extend(current.children)
+
+    def to_dict(self):
+        data = {
+            "request_id": self.request_id,
+            "name": self.root.name,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 3),
+            "spans": [child.to_dict(self.root.start) for child in self.root.children],
+        }
+        if self.root.attrs:
+            data["attrs"] = self.root.attrs
+        return data
+
+
+# -------------------------------
+# Trace / Span API
+# -------------------------------
+def start_trace(name, request_id=None):
+    trace = Trace(name, request_id)
+    _current_trace.set(trace)
+    return trace
+
+
+def finish_trace(trace, **attrs):
+    trace.root.end = time.perf_counter()
+    trace.root.attrs.update(attrs)
+    if trace.profiler is not None:
+        trace.profiler.stop()
+    if _current_trace.get() is trace:
+        _current_trace.set(None)
+    log_if_slow(trace)
+    return trace
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def detached_context():
+    """Copy of the caller's context without its trace, for work handed to another thread.
+
+    Spans opened there would otherwise land on the request's span stack
+    from a different thread and capture the request's later spans.
+    """
+    context = contextvars.copy_context()
+    context.run(_current_trace.set, None)
+    return context
+
+
+class span:
+    """Time a stage of the current trace; a no-op outside of a trace."""
+
+    __slots__ = ("name", "attrs", "trace", "span")
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.trace = None
+        self.span = None
+
+    def __enter__(self):
+        trace = _current_trace.get()
+        if trace is not None:
+            self.trace = trace
+            self.span = Span(self.name, self.attrs)
+            trace.stack[-1].children.append(self.span)
+            trace.stack.append(self.span)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is not None:
+            self.span.end = time.perf_counter()
+            if exc_type is not None:
+                self.span.attrs["error"] = exc_type.__name__
+            if self.trace.stack and self.trace.stack[-1] is self.span:
+                self.trace.stack.pop()
+        return False
+
+
+# -------------------------------
+# Output: Server-Timing and Slow Log
+# -------------------------------
+def server_timing_header(trace):
+    """Build a Server-Timing header value with one entry per span."""
+    entries = []
+    for index, current in enumerate(trace.iter_spans()):
+        metric = re.sub(r"[^A-Za-z0-9_-]", "_", current.name)
+        entries.append(f'{metric};dur={current.duration_ms:.1f};desc="{index}"')
+    entries.append(f"total;dur={trace.duration_ms:.1f}")
+    return ", ".join(entries)
+
+
+def log_if_slow(trace):
+    if trace.duration_ms < SLOW_REQUEST_MS:
+        return
+    line = json.dumps(trace.to_dict(), default=str)
+    with _log_lock:
+        with open(SLOW_REQUEST_LOG, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+# -------------------------------
+# Sampling Profiler Hook
+# -------------------------------
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval and writes folded stacks
+    (the input format of flamegraph.pl / speedscope) when stopped."""
+
+    def __init__(self, thread_id, output_path, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.output_path = output_path
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        os.makedirs(os.path.dirname(self.output_path) or ".", exist_ok=True)
+        with open(self.output_path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def start_profiler(trace):
+    path = os.path.join(PROFILES_FOLDER, f"{trace.request_id}.folded")
+    trace.profiler = SamplingProfiler(threading.get_ident(), path).start()
+    return trace.profiler
+
+
+# -------------------------------
+# Flask Integration
+# -------------------------------
+def init_app(app):
+    from flask import g, request # type: ignore
+
+    @app.before_request
+    def _start_request_trace():
+        request_id = request.headers.get("X-Request-ID", "")
+        if not _REQUEST_ID_RE.fullmatch(request_id):
+            request_id = None
+        g.trace = start_trace(f"{request.method} {request.path}", request_id)
+        if PROFILING_ENABLED and request.headers.get("X-Profile") == "1":
+            start_profiler(g.trace)
+
+    @app.after_request
+    def _finish_request_trace(response):
+        trace = g.pop("trace", None)
+        if trace is not None:
+            finish_trace(trace, status=response.status_code)
+            response.headers["X-Request-ID"] = trace.request_id
+            response.headers["Server-Timing"] = server_timing_header(trace)
+        return response
+
+    @app.teardown_request
+    def _discard_request_trace(exc):
+        trace = g.pop("trace", None)
+        if trace is not None:
+            finish_trace(trace, error=type(exc).__name__ if exc else None)
@@ -0,0 +1,195 @@
+"""
+Multi-tenant server: every bot in one process.
+
+    python multitenant/server.py --config multitenant/tenants.json --port 5000
+
+Each tenant is a chatbot_common.chatbot.Chatbot built from its entry in
+tenants.json alone: the entry's "config" overrides DEFAULT_CONFIG keys
+(document, system prompt, sales contact, LEAD_RULES, HISTORY_MODE, DB
+path, ...), so adding a bot needs no Python. Every Chatbot keeps its own
+config, caches, DB and folders. Requests are routed by Host header first,
+then by path prefix (/qbytz/chat reaches the qbytz tenant's /chat).
+
+What tenants share:
+    - one Bedrock router and client per inference profile (LLM_ROUTER)
+    - one lead-extraction thread pool, polling every tenant in turn
+    - one metrics registry; every sample carries a tenant="..." label,
+      served at /metrics
+
+Relative paths in a tenant's config are resolved against its "folder";
+the folder and secrets_file are resolved against the folder of
+tenants.json.
+"""
+import os
+import sys
+import json
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import make_server # type: ignore
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Every tenant uses the same chatbot_common modules, which is what makes
+# the registry and router shared.
+sys.path.insert(0, SRC_DIR)
+from chatbot_common import metrics, routing, chatbot # noqa: E402
+
+# CONFIG keys holding paths; each tenant needs its own copy of the data ones
+PATH_KEYS = ("SECRETS_FILE", "DOCUMENT_PATH", "DB_PATH", "CONVERSATIONS_FOLDER", "CONTACTS_FOLDER", "FAQ_PATH",
+             "SYSTEM_PROMPT_FILE", "SITE_FOLDER", "IMAGE_FOLDER", "TEMPLATE_FOLDER")
+ISOLATED_KEYS = ("DB_PATH", "CONVERSATIONS_FOLDER", "CONTACTS_FOLDER")
+
+
+# -------------------------------
+# Tenants
+# -------------------------------
+class Tenant:
+    def __init__(self, name, bot, app, hosts=(), prefix=None):
+        self.name = name
+        self.bot = bot
+        self.app = app
+        self.hosts = {host.lower() for host in hosts}
+        self.prefix = "/" + prefix.strip("/") if prefix else None
+        self.processed_files = {}  # lead extraction state, see run_lead_extraction_once
+
+
+def resolve_config(folder, overrides):
+    config = dict(overrides)
+    for key in PATH_KEYS:
+        value = config.get(key, chatbot.DEFAULT_CONFIG.get(key))
+        if value and not os.path.isabs(value):
+            config[key] = os.path.normpath(os.path.join(folder, value))
+    return config
+
+
+def build_shared_router(secrets_file, client_factory):
+    with open(secrets_file, "r", encoding="utf-8") as f:
+        secrets = json.load(f)
+    return routing.Router([routing.Endpoint(profile, client_factory) for profile in routing.load_profiles(secrets)])
+
+
+def load_tenants(config_path, warm_up=True):
+    """Build every tenant app from tenants.json; returns (tenants, shared router)."""
+    with open(config_path, "r", encoding="utf-8") as f:
+        settings = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(config_path))
+
+    specs = []
+    for entry in settings["tenants"]:
+        folder = os.path.join(base_dir, entry["folder"])
+        specs.append((entry, chatbot.Chatbot(resolve_config(folder, entry.get("config", {})))))
+
+    for key in ISOLATED_KEYS:
+        paths = [bot.defaults[key] for _, bot in specs]
+        if len(set(paths)) != len(paths):
+            raise ValueError(f"Tenants must not share {key}: {paths}")
+
+    # Clients are built by the first tenant's factory (BEDROCK_CLIENT or boto3)
+    secrets_file = os.path.join(base_dir, settings.get("secrets_file", "../secrets.json"))
+    router = build_shared_router(secrets_file, specs[0][1].build_bedrock_client)
+
+    tenants = []
+    for entry, bot in specs:
+        token = metrics.set_common_labels(tenant=entry["name"])
+        try:
+            app = bot.create_app({"LLM_ROUTER": router, "WARM_UP": warm_up})
+        finally:
+            metrics.reset_common_labels(token)
+        tenants.append(Tenant(entry["name"], bot, app, entry.get("hosts", ()), entry.get("prefix")))
+    return tenants, router
+
+
+# -------------------------------
+# Routing
+# -------------------------------
+class TenantDispatcher:
+    """WSGI app that hands each request to its tenant."""
+
+    def __init__(self, tenants):
+        self.tenants = tenants
+        self.by_host = {host: tenant for tenant in tenants for host in tenant.hosts}
+
+    def match(self, environ):
+        """Return (tenant, prefix to move into SCRIPT_NAME) or (None, None)."""
+        host = environ.get("HTTP_HOST", "").split(":")[0].lower()
+        if host in self.by_host:
+            return self.by_host[host], ""
+        path = environ.get("PATH_INFO", "")
+        for tenant in self.tenants:
+            if tenant.prefix and (path == tenant.prefix or path.startswith(tenant.prefix + "/")):
+                return tenant, tenant.prefix
+        return None, None
+
+    def __call__(self, environ, start_response):
+        tenant, prefix = self.match(environ)
+        if tenant is None:
+            if environ.get("PATH_INFO") == "/metrics" and metrics.METRICS_ENABLED:
+                start_response("200 OK", [("Content-Type", metrics.CONTENT_TYPE)])
+                return [metrics.render_prometheus().encode("utf-8")]
+            start_response("404 Not Found", [("Content-Type", "application/json")])
+            return [json.dumps({"error": "Unknown tenant"}).encode("utf-8")]
+
+        if prefix:
+            environ["SCRIPT_NAME"] = environ.get("SCRIPT_NAME", "") + prefix
+            environ["PATH_INFO"] = environ["PATH_INFO"][len(prefix):] or "/"
+        token = metrics.set_common_labels(tenant=tenant.name)
+        try:
+            return tenant.app(environ, start_response)
+        finally:
+            metrics.reset_common_labels(token)
+
+
+# -------------------------------
+# Lead Extraction
+# -------------------------------
+def run_tenant_leads(tenant):
+    token = metrics.set_common_labels(tenant=tenant.name)
+    try:
+        return tenant.bot.run_lead_extraction_once(tenant.processed_files)
+    except Exception as e:
+        print(f"[{tenant.name}] lead extraction failed: {e}")
+        return 0
+    finally:
+        metrics.reset_common_labels(token)
+
+
+def lead_extraction_loop(tenants, workers, poll_seconds, stop_event):
+    """Poll every tenant's conversations on one shared pool instead of a thread per app."""
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="leads") as pool:
+        while not stop_event.is_set():
+            # A tenant is never polled again before its previous pass finished
+            list(pool.map(run_tenant_leads, tenants))
+            stop_event.wait(poll_seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve every chatbot tenant from one process.")
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "tenants.json"))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--lead-workers", type=int, default=2, help="threads shared by all tenants' lead extraction")
+    parser.add_argument("--lead-poll-seconds", type=float, default=10.0)
+    parser.add_argument("--no-lead-worker", action="store_true", help="do not run lead extraction")
+    args = parser.parse_args()
+
+    tenants, router = load_tenants(args.config)
+    print(f"Tenants: {', '.join(t.name for t in tenants)}; profiles: {', '.join(e.name for e in router.endpoints)}")
+
+    stop_event = threading.Event()
+    if not args.no_lead_worker:
+        threading.Thread(target=lead_extraction_loop, daemon=True,
+                         args=(tenants, args.lead_workers, args.lead_poll_seconds, stop_event)).start()
+
+    server = make_server(args.host, args.port, TenantDispatcher(tenants), threaded=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
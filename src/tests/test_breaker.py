@@ -0,0 +1,78 @@
+"""Circuit breaker states and the degraded-mode reply cache."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chatbot_common import breaker # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def make_breaker(monkeypatch, failures=3, reset=30.0):
+    clock = Clock()
+    monkeypatch.setattr(breaker, "time", clock)
+    return breaker.CircuitBreaker(failures, reset), clock
+
+
+def test_consecutive_failures_open_the_circuit(monkeypatch):
+    circuit, _ = make_breaker(monkeypatch)
+    circuit.record_failure()
+    circuit.record_failure()
+    circuit.record_success()  # a success resets the count
+    circuit.record_failure()
+    circuit.record_failure()
+    assert circuit.state == breaker.CLOSED and circuit.allow()
+
+    circuit.record_failure()
+    assert circuit.state == breaker.OPEN
+    assert not circuit.allow()
+
+
+def test_half_open_lets_one_probe_through(monkeypatch):
+    circuit, clock = make_breaker(monkeypatch, failures=1)
+    circuit.record_failure()
+    clock.now += 29.9
+    assert not circuit.allow()
+
+    clock.now += 0.1
+    assert circuit.state == breaker.HALF_OPEN
+    assert circuit.allow()
+    assert not circuit.allow()  # the probe is still out
+
+    circuit.record_success()
+    assert circuit.state == breaker.CLOSED
+    assert circuit.allow() and circuit.allow()
+
+
+def test_a_failed_probe_opens_the_circuit_again(monkeypatch):
+    circuit, clock = make_breaker(monkeypatch, failures=3)
+    for _ in range(3):
+        circuit.record_failure()
+    clock.now += 30
+    assert circuit.allow()
+
+    circuit.record_failure()  # one failure is enough while half-open
+    assert circuit.state == breaker.OPEN
+    assert not circuit.allow()
+    clock.now += 30
+    assert circuit.allow()
+
+
+def test_reply_cache_normalizes_and_evicts_the_least_recently_stored():
+    cache = breaker.ReplyCache(max_size=2)
+    cache.put("What do you offer?", "Chatbots.")
+    cache.put("Where are you?", "Bengaluru.")
+    cache.put("what do you offer", "AI chatbots.")  # same question, stored again
+    cache.put("How much?", "It depends.")
+    assert len(cache) == 2
+    assert cache.get("Where are you?") is None
+    assert cache.get("WHAT do you offer ?") == "AI chatbots."
+    assert cache.get("  how much ") == "It depends."
+    cache.put("?!", "ignored")  # nothing left to match on
+    assert len(cache) == 2
@@ -0,0 +1,119 @@
+"""Replies served while the model is unavailable."""
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chatbot_common import breaker # noqa: E402
+from chatbot_common.chatbot import Chatbot, LLMUnavailable # noqa: E402
+
+EXTRACTION = '"name": "", "phone": "", "email": "", "pain_points": ""}'
+
+
+class FakeModel:
+    """Stands in for invoke_llm_routed: answers, or fails while down."""
+
+    def __init__(self):
+        self.down = False
+        self.chat_calls = 0
+
+    def __call__(self, body, model="default"):
+        if self.down:
+            raise LLMUnavailable("Bedrock is down")
+        if "extracting" in body:
+            text = EXTRACTION
+        else:
+            self.chat_calls += 1
+            text = f"Answer {self.chat_calls}"
+        return {"content": [{"type": "text", "text": text}], "stop_reason": "end_turn"}
+
+
+def make_bot(tmp_path, **config):
+    bot = Chatbot(dict({key: str(tmp_path / name) for key, name in (
+        ("SECRETS_FILE", "secrets.json"), ("DB_PATH", "bot.db"), ("CONVERSATIONS_FOLDER", "conversations"),
+        ("CONTACTS_FOLDER", "contacts"), ("FAQ_PATH", "faq.json"))},
+        SALES_CONTACT="sales@example.com", LLM_BREAKER_FAILURES=2, LLM_BREAKER_RESET_SECONDS=60, **config))
+    app = bot.create_app()
+    model = FakeModel()
+    bot.invoke_llm_routed = model
+    bot.get_company_info_text = lambda: "We build chatbots."
+    return bot, app.test_client(), model
+
+
+def ask(client, message, session_id=None):
+    response = client.post("/chat", json={"user_query": message, "session_id": session_id})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def start(client):
+    """A session whose details are on record, so questions go to the model."""
+    return ask(client, "Asha 9876543210")["session_id"]
+
+
+def stored_answers(bot, session_id):
+    conn = bot.connect_db()
+    rows = conn.execute("SELECT answer, answered_by FROM conversations WHERE user_id = ? ORDER BY id",
+                        (session_id,)).fetchall()
+    conn.close()
+    return rows
+
+
+def test_fallback_names_the_sales_contact_and_is_not_stored(tmp_path):
+    bot, client, model = make_bot(tmp_path)
+    model.down = True
+
+    session_id = start(client)
+    answer = ask(client, "What does the course cost?", session_id)
+    assert answer["degraded"] is True
+    assert answer["reply"].endswith("write to sales@example.com.")
+    assert stored_answers(bot, session_id)[1:] == [(None, None)]
+
+
+def test_open_breaker_fails_fast(tmp_path):
+    bot, client, model = make_bot(tmp_path, LEAD_CAPTURE=False)
+    model.down = True
+    for _ in range(2):
+        assert ask(client, "What does the course cost?")["degraded"]
+    assert bot._llm_breaker.state == breaker.OPEN
+
+    # Back up, but the circuit stays open until the reset timeout
+    model.down = False
+    assert ask(client, "What does the course cost?")["degraded"]
+    assert model.chat_calls == 0
+
+
+def test_first_model_answer_of_a_session_is_served_while_degraded(tmp_path):
+    bot, client, model = make_bot(tmp_path)
+    session_id = start(client)
+    assert ask(client, "What does the course cost?", session_id)["reply"] == "Answer 1"
+    # Follow-ups may lean on earlier answers, so only the first one is kept
+    ask(client, "And the advanced one?", session_id)
+
+    model.down = True
+    other = start(client)
+    answer = ask(client, "what does the course cost", other)
+    assert answer["degraded"] and answer["reply"] == "Answer 1"
+    assert ask(client, "And the advanced one?", other)["reply"].endswith("sales@example.com.")
+
+
+def test_a_question_asked_again_after_a_degraded_reply_is_remembered(tmp_path):
+    bot, client, model = make_bot(tmp_path)
+    session_id = start(client)
+    model.down = True
+    assert ask(client, "What does the course cost?", session_id)["degraded"]
+    model.down = False
+    # Neither the local detail turn nor the degraded one counts as an earlier answer
+    assert ask(client, "What does the course cost?", session_id)["reply"] == "Answer 1"
+    assert [by for _, by in stored_answers(bot, session_id)] == ["lead_capture", None, "model"]
+
+    model.down = True
+    assert ask(client, "What does the course cost?", start(client))["reply"] == "Answer 1"
+
+
+def test_faq_file_seeds_the_cache(tmp_path):
+    with open(tmp_path / "faq.json", "w", encoding="utf-8") as f:
+        json.dump({"Where are you based?": "Bengaluru."}, f)
+    bot, client, model = make_bot(tmp_path)
+    model.down = True
+    assert ask(client, "where are you based", start(client))["reply"] == "Bengaluru."
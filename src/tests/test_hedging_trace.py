@@ -0,0 +1,63 @@
+"""Span nesting of a traced request whose model call is hedged."""
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chatbot_common import metrics, routing, tracing # noqa: E402
+
+
+def span_names(span):
+    return [child.name for child in span.children]
+
+
+def test_hedged_attempts_stay_out_of_the_request_trace():
+    primary_entered = threading.Event()
+    release_primary = threading.Event()
+
+    def attempt(name, wait):
+        with tracing.span("bedrock.invoke", profile=name):
+            if wait:
+                primary_entered.set()
+                # The slow attempt is still inside its span while the request carries on
+                release_primary.wait(5)
+            return name
+
+    trace = tracing.start_trace("POST /chat")
+    try:
+        with tracing.span("llm.chat"):
+            result, winner, hedged = routing.hedged_call(
+                lambda: attempt("primary", True), lambda: attempt("backup", False), delay=0.05)
+        assert primary_entered.wait(5)
+        with tracing.span("llm.lead_extraction"):
+            with tracing.span("db.save_conversation"):
+                pass
+    finally:
+        release_primary.set()
+        tracing.finish_trace(trace)
+
+    assert (result, winner, hedged) == ("backup", 1, True)
+    assert span_names(trace.root) == ["llm.chat", "llm.lead_extraction"]
+    assert span_names(trace.root.children[0]) == []
+    assert span_names(trace.root.children[1]) == ["db.save_conversation"]
+    assert trace.stack == [trace.root]
+
+
+def test_hedged_attempts_keep_the_metric_labels():
+    calls = metrics.counter("test_hedged_attempts_total", "Hedged attempts seen by the test.", ["outcome"])
+    traces = []
+
+    def attempt():
+        traces.append(tracing.current_trace())
+        calls.inc(outcome="ok")
+
+    token = metrics.set_common_labels(tenant="qbytz")
+    try:
+        trace = tracing.start_trace("POST /chat")
+        routing.hedged_call(attempt, lambda: None, delay=5)
+        tracing.finish_trace(trace)
+    finally:
+        metrics.reset_common_labels(token)
+
+    assert traces == [None]
+    assert 'test_hedged_attempts_total{tenant="qbytz",outcome="ok"} 1' in metrics.render_prometheus()
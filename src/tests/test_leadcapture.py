@@ -0,0 +1,65 @@
+"""Scripted lead-capture turns."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chatbot_common import leadcapture # noqa: E402
+
+ASK_NAME = "Thanks! " + leadcapture.NAME_PROMPT
+
+
+def test_bare_name_is_taken_after_the_name_prompt():
+    turn = leadcapture.next_turn("Rahul Sharma", {"phone": "9876543210"}, False, "Bot", previous_reply=ASK_NAME)
+    assert turn.details == {"name": "Rahul Sharma"}
+    assert turn.kind == "details_received"
+
+
+def test_phrases_are_not_names():
+    for message in ("tell me more", "ok sure", "send details", "pricing please"):
+        turn = leadcapture.next_turn(message, {"phone": "9876543210"}, False, "Bot", previous_reply=ASK_NAME)
+        assert "name" not in turn.details, message
+
+
+def test_bare_name_needs_a_name_prompt():
+    turn = leadcapture.next_turn("Rahul Sharma", {"phone": "9876543210"}, False, "Bot",
+                                 previous_reply="We offer AI chatbots.")
+    assert "name" not in turn.details
+
+
+def test_details_with_a_question_are_answered_and_ask_for_the_rest():
+    turn = leadcapture.next_turn("Raj 9876543210 what is your pricing?", {}, False, "Bot",
+                                 previous_reply="Hello! I'm Bot. To assist you further, "
+                                                + leadcapture.NAME_AND_PHONE_PROMPT)
+    assert turn.reply is None
+    assert turn.details == {"phone": "9876543210"}
+    assert turn.follow_up == leadcapture.NAME_PROMPT
+
+
+def test_mentions_details_checks_each_name_word_and_the_phone_digits():
+    lead = {"name": "Rahul Sharma", "phone": "9876543210"}
+    assert leadcapture.mentions_details("Sure Rahul, we run AI courses.", lead)
+    assert leadcapture.mentions_details("We will call you on +91 98765 43210.", lead)
+    assert not leadcapture.mentions_details("We run AI and data science courses.", lead)
+
+
+def test_follow_ups_are_questions_but_details_are_not():
+    assert leadcapture.is_question("how much?")
+    assert not leadcapture.is_question("Rahul Sharma 9876543210")
+    assert not leadcapture.is_question("hi")
+
+
+def test_bare_name_next_to_a_phone_is_taken_on_any_turn():
+    for message in ("Priya 9123456780", "9123456780 Priya"):
+        turn = leadcapture.next_turn(message, {}, True, "Bot")
+        assert turn.kind == "details_received", message
+        assert turn.details == {"name": "Priya", "phone": "9123456780"}
+
+
+def test_contact_phrasings_are_details_not_questions():
+    for message in ("call me at 9876543210", "I am from Delhi, 9876543210",
+                    "please call me back on +91 98765 43210"):
+        turn = leadcapture.next_turn(message, {}, True, "Bot")
+        assert turn.kind == "ask_name", message
+        assert turn.reply == ASK_NAME
+        assert turn.details["phone"].endswith("9876543210")
+        assert not leadcapture.is_question(message)
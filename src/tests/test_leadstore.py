@@ -0,0 +1,144 @@
+"""The deduplicated leads table."""
+import os
+import io
+import csv
+import sys
+import json
+import sqlite3
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chatbot_common import leadstore # noqa: E402
+from chatbot_common.chatbot import Chatbot # noqa: E402
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path)
+    leadstore.init_schema(conn.cursor())
+    conn.commit()
+    return conn
+
+
+def leads(conn):
+    return conn.execute(
+        "SELECT name, phone, email, pain_points, first_seen, last_seen FROM leads ORDER BY id").fetchall()
+
+
+def test_sightings_of_one_phone_merge(tmp_path):
+    conn = connect(str(tmp_path / "leads.db"))
+    first = leadstore.upsert(conn, {"name": "Asha", "phone": "+91 98765 43210"}, "chat", seen_at="2026-01-01T10:00:00")
+    again = leadstore.upsert(conn, {"phone": "09876543210", "email": "Asha@Example.com", "pain_points": "Slow support"},
+                             "extraction", seen_at="2026-01-02T10:00:00")
+    assert first == again
+    # Newer non-empty values win, missing ones keep the old value, first_seen stays the oldest
+    assert leads(conn) == [("Asha", "09876543210", "Asha@Example.com", "Slow support",
+                            "2026-01-01T10:00:00", "2026-01-02T10:00:00")]
+    assert leadstore.upsert(conn, {"phone": "98765 43210", "email": "asha@example.com"}, "chat") == first
+
+
+def test_leads_without_phone_or_email_are_ignored(tmp_path):
+    conn = connect(str(tmp_path / "leads.db"))
+    assert leadstore.upsert(conn, {"name": "Asha", "phone": "12345", "email": "none"}, "chat") is None
+    assert leads(conn) == []
+
+
+def test_a_sighting_linking_two_leads_folds_them(tmp_path):
+    conn = connect(str(tmp_path / "leads.db"))
+    by_phone = leadstore.upsert(conn, {"name": "Asha", "phone": "9876543210"}, "chat", seen_at="2026-01-01T10:00:00")
+    leadstore.upsert(conn, {"email": "asha@example.com", "pain_points": "Pricing"}, "chat",
+                     seen_at="2026-01-02T10:00:00")
+    assert len(leads(conn)) == 2
+
+    kept = leadstore.upsert(conn, {"phone": "9876543210", "email": "asha@example.com"}, "extraction",
+                            seen_at="2026-01-03T10:00:00")
+    assert kept == by_phone
+    assert leads(conn) == [("Asha", "9876543210", "asha@example.com", "Pricing",
+                            "2026-01-01T10:00:00", "2026-01-03T10:00:00")]
+
+
+def test_concurrent_upserts_of_a_phone_keep_one_row(tmp_path):
+    db_path = str(tmp_path / "leads.db")
+    connect(db_path).close()
+    errors = []
+    start = threading.Barrier(8)
+
+    def sighting(index):
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            start.wait()
+            # Every thread sees each number first, so the inserts race
+            for number in range(100):
+                leadstore.upsert(conn, {"name": f"Visitor {index}", "phone": f"98765{number:05d}"}, "chat")
+                conn.commit()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=sighting, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    conn = connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM leads").fetchone()[0] == 100
+    conn.close()
+
+
+def exported_rows(db_path, fmt, chunk_size):
+    return b"".join(leadstore.stream_export(db_path, fmt, chunk_size))
+
+
+def test_csv_export_is_chunked_and_neutralises_formulas(tmp_path):
+    db_path = str(tmp_path / "leads.db")
+    conn = connect(db_path)
+    leadstore.upsert(conn, {"name": "=HYPERLINK(\"http://x\")", "phone": "9876543210"}, "chat")
+    leadstore.upsert(conn, {"name": "@SUM(A1)", "phone": "9123456780", "pain_points": "-1+1"}, "chat")
+    leadstore.upsert(conn, {"name": "Asha", "phone": "+91 98765 00000"}, "chat")
+    conn.commit()
+    conn.close()
+
+    data = exported_rows(db_path, "csv", chunk_size=1)
+    assert data == exported_rows(db_path, "csv", chunk_size=1000)
+    rows = list(csv.reader(io.StringIO(data.decode("utf-8"))))
+    assert tuple(rows[0]) == leadstore.COLUMNS
+    assert [row[1:5] for row in rows[1:]] == [
+        ["'=HYPERLINK(\"http://x\")", "9876543210", "", ""],
+        ["'@SUM(A1)", "9123456780", "", "'-1+1"],
+        ["Asha", "'+91 98765 00000", "", ""],
+    ]
+
+
+def test_parquet_export_round_trips(tmp_path):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet # noqa: F401
+    db_path = str(tmp_path / "leads.db")
+    conn = connect(db_path)
+    for number in range(5):
+        leadstore.upsert(conn, {"name": f"=Visitor {number}", "phone": f"98765{number:05d}"}, "chat")
+    conn.commit()
+    conn.close()
+
+    table = pyarrow.parquet.read_table(io.BytesIO(exported_rows(db_path, "parquet", chunk_size=2)))
+    assert table.column_names == list(leadstore.COLUMNS)
+    # Parquet keeps the values as typed; only CSV is opened as a spreadsheet
+    assert table.column("name").to_pylist() == [f"=Visitor {number}" for number in range(5)]
+
+
+def test_export_takes_the_token_from_the_authorization_header_only(tmp_path):
+    with open(tmp_path / "secrets.json", "w", encoding="utf-8") as f:
+        json.dump({"ADMIN_TOKEN": "s3cret"}, f)
+    bot = Chatbot({key: str(tmp_path / name) for key, name in (
+        ("SECRETS_FILE", "secrets.json"), ("DB_PATH", "bot.db"), ("CONVERSATIONS_FOLDER", "conversations"),
+        ("CONTACTS_FOLDER", "contacts"), ("FAQ_PATH", "faq.json"))})
+    client = bot.create_app().test_client()
+
+    assert client.get("/leads/export?token=s3cret").status_code == 401
+    assert client.get("/leads/export", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/leads/export", headers={"Authorization": "Bearer s3cret"})
+    assert response.status_code == 200
+    assert response.data.decode("utf-8").splitlines()[0] == ",".join(leadstore.COLUMNS)
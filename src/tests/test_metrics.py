@@ -0,0 +1,40 @@
+"""Merging the metrics of pre-forked processes."""
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chatbot_common import metrics # noqa: E402
+
+REQUESTS = metrics.counter("test_mp_requests_total", "Requests.", ["route"])
+LATENCY = metrics.histogram("test_mp_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+STATE = metrics.gauge("test_mp_state", "State.")
+
+
+def sample(text, name):
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+def test_snapshots_of_every_process_are_merged(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "_multiprocess_dir", str(tmp_path))
+    REQUESTS.inc(2, route="chat")
+    LATENCY.observe(0.05)
+    STATE.set(1)
+    # Another worker's snapshot
+    worker = {name: values for name, values in metrics.snapshot().items() if name.startswith("test_mp_")}
+    with open(tmp_path / "999999.json", "w", encoding="utf-8") as f:
+        json.dump(worker, f)
+    REQUESTS.inc(1, route="chat")
+
+    text = metrics.render_prometheus()
+    assert sample(text, "test_mp_requests_total") == ['test_mp_requests_total{route="chat"} 5']
+    assert 'test_mp_latency_seconds_count 2' in sample(text, "test_mp_latency_seconds_count")
+    assert sorted(sample(text, "test_mp_state")) == sorted(
+        [f'test_mp_state{{pid="{os.getpid()}"}} 1', 'test_mp_state{pid="999999"} 1'])
+
+    # The worker exits: its counts are kept, its gauge is dropped
+    metrics.collect_exited([999999])
+    assert not os.path.exists(tmp_path / "999999.json")
+    text = metrics.render_prometheus()
+    assert sample(text, "test_mp_requests_total") == ['test_mp_requests_total{route="chat"} 5']
+    assert sample(text, "test_mp_state") == [f'test_mp_state{{pid="{os.getpid()}"}} 1']
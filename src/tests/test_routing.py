@@ -0,0 +1,158 @@
+"""Health-scored routing across inference profiles, failover and hedging."""
+import os
+import sys
+import json
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chatbot_common import routing # noqa: E402
+from chatbot_common.chatbot import Chatbot, LLMUnavailable # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(routing, "time", clock)
+    monkeypatch.setattr(routing.random, "uniform", lambda low, high: 0.0)
+    return clock
+
+
+def endpoint(name, client=None):
+    return routing.Endpoint({"name": name, "INFERENCE_PROFILE_ARN": f"arn:{name}"}, lambda profile: client)
+
+
+def test_score_is_the_latency_ewma_plus_a_failure_penalty():
+    profile = endpoint("a")
+    assert profile.score() == 0.0  # untried profiles get tried
+    profile.record_success(1.0)
+    profile.record_success(0.5)
+    assert profile.latency_ewma == pytest.approx(0.9)
+    profile.record_failure(cooldown=False)
+    assert profile.score() == pytest.approx(0.9 + 10.0 * 0.2)
+    profile.record_success(0.9)
+    assert profile.failure_ewma == pytest.approx(0.16)
+    assert profile.consecutive_failures == 0
+
+
+def test_cooldown_doubles_per_failure_up_to_30_seconds(clock):
+    profile = endpoint("a")
+    for seconds in (1, 2, 4, 8, 16, 30, 30):
+        profile.record_failure()
+        assert profile.cooldown_until == clock.now + seconds
+    assert not profile.available()
+    clock.now += 30
+    assert profile.available()
+
+    # Errors that are not throttles lower the score but keep the profile in rotation
+    other = endpoint("b")
+    other.record_failure(cooldown=False)
+    assert other.available()
+
+
+def test_router_prefers_the_best_score_and_skips_cooling_profiles(clock):
+    first, second = endpoint("a"), endpoint("b")
+    router = routing.Router([first, second], explore=0)
+    assert router.choose() is first  # ties go to the configured order
+    first.record_success(2.0)
+    second.record_success(1.0)
+    assert router.choose() is second
+    assert router.choose(exclude=(second,)) is first
+
+    second.record_failure()
+    assert router.choose() is first
+    # With every profile cooling down, the one back first is returned
+    first.record_failure()
+    first.record_failure()
+    assert router.choose() is second
+    assert router.choose(exclude=(first, second)) is None
+
+
+def test_hedged_call_starts_the_backup_only_when_the_primary_is_slow():
+    assert routing.hedged_call(lambda: "primary", lambda: "backup", delay=1) == ("primary", 0, False)
+
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return "primary"
+
+    try:
+        assert routing.hedged_call(slow, lambda: "backup", delay=0.01) == ("backup", 1, True)
+    finally:
+        release.set()
+
+
+def test_hedged_call_returns_the_survivor_and_raises_when_all_fail():
+    def slow_ok():
+        threading.Event().wait(0.05)
+        return "primary"
+
+    def fail(message, wait=0):
+        def call():
+            threading.Event().wait(wait)
+            raise RuntimeError(message)
+        return call
+
+    assert routing.hedged_call(slow_ok, fail("backup"), delay=0.01) == ("primary", 0, True)
+    with pytest.raises(RuntimeError, match="primary"):
+        routing.hedged_call(fail("primary"), lambda: "backup", delay=1)  # no backup for a fast error
+    # The first error to arrive is the one raised
+    with pytest.raises(RuntimeError, match="backup"):
+        routing.hedged_call(fail("primary", wait=0.05), fail("backup"), delay=0.01)
+
+
+class ThrottlingException(Exception):
+    pass
+
+
+class FakeClient:
+    """bedrock-runtime stand-in failing with the given exception, or answering."""
+
+    exceptions = type("exceptions", (), {"ThrottlingException": ThrottlingException})
+
+    def __init__(self, error=None):
+        self.error = error
+        self.model_ids = []
+
+    def invoke_model(self, modelId, **kwargs):
+        self.model_ids.append(modelId)
+        if self.error is not None:
+            raise self.error
+        body = json.dumps({"content": [{"type": "text", "text": "ok"}]}).encode("utf-8")
+        return {"body": type("Body", (), {"read": lambda self: body})()}
+
+
+def routed_bot(tmp_path, clients):
+    router = routing.Router([endpoint(name, client) for name, client in clients], explore=0)
+    bot = Chatbot({key: str(tmp_path / name) for key, name in (
+        ("DB_PATH", "bot.db"), ("CONVERSATIONS_FOLDER", "conversations"), ("CONTACTS_FOLDER", "contacts"))})
+    bot.create_app({"LLM_ROUTER": router})
+    return bot, router
+
+
+@pytest.mark.parametrize("error", [ThrottlingException("slow down"), RuntimeError("500")])
+def test_a_failing_profile_fails_over_to_the_next(tmp_path, error):
+    failing, healthy = FakeClient(error), FakeClient()
+    bot, router = routed_bot(tmp_path, [("a", failing), ("b", healthy)])
+
+    assert bot.invoke_llm_routed("{}")["content"][0]["text"] == "ok"
+    assert (failing.model_ids, healthy.model_ids) == (["arn:a"], ["arn:b"])
+    # Only a throttle takes the profile out of rotation
+    assert router.endpoints[0].available() == (not isinstance(error, ThrottlingException))
+    assert router.choose() is router.endpoints[1]
+
+
+def test_errors_on_every_profile_make_the_model_unavailable(tmp_path):
+    bot, _ = routed_bot(tmp_path, [("a", FakeClient(RuntimeError("500"))), ("b", FakeClient(RuntimeError("502")))])
+    with pytest.raises(LLMUnavailable):
+        bot.invoke_llm_routed("{}")
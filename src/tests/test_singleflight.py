@@ -0,0 +1,96 @@
+"""Coalescing of identical concurrent calls."""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chatbot_common import singleflight # noqa: E402
+
+
+def run_together(flight, key, func, callers):
+    """Start callers that all call flight.do(key, func) while the leader is blocked."""
+    outcomes = [None] * callers
+
+    def call(index):
+        try:
+            outcomes[index] = ("ok", flight.do(key, func, timeout=5))
+        except Exception as e:
+            outcomes[index] = ("error", e)
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def wait_for_waiters(flight, key, count):
+    for _ in range(500):
+        with flight._lock:
+            call = flight._calls.get(key)
+            if call is not None and call.waiters == count:
+                return
+        threading.Event().wait(0.01)
+    raise AssertionError("callers never joined the flight")
+
+
+def test_identical_calls_share_one_execution():
+    flight = singleflight.SingleFlight()
+    release, calls = threading.Event(), []
+
+    def func():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    threads, outcomes = run_together(flight, "k", func, 5)
+    wait_for_waiters(flight, "k", 4)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(outcome[1] for outcome in outcomes) == [("answer", False)] + [("answer", True)] * 4
+    assert flight.in_flight() == 0
+    # A later call runs again instead of reusing the finished result
+    assert flight.do("k", lambda: "fresh") == ("fresh", False)
+
+
+def test_the_leaders_error_reaches_every_waiter():
+    flight = singleflight.SingleFlight()
+    release = threading.Event()
+
+    def func():
+        release.wait(5)
+        raise ValueError("upstream failed")
+
+    threads, outcomes = run_together(flight, "k", func, 3)
+    wait_for_waiters(flight, "k", 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert [kind for kind, _ in outcomes] == ["error"] * 3
+    assert all(str(error) == "upstream failed" for _, error in outcomes)
+    assert flight.in_flight() == 0
+
+
+def test_waiters_give_up_after_the_timeout():
+    flight = singleflight.SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=flight.do, args=("k", lambda: release.wait(5)))
+    leader.start()
+    try:
+        while not flight.in_flight():
+            threading.Event().wait(0.01)
+        with pytest.raises(singleflight.SingleFlightTimeout):
+            flight.do("k", lambda: None, timeout=0.05)
+    finally:
+        release.set()
+        leader.join(5)
+
+
+def test_payload_key_separates_parts():
+    assert singleflight.payload_key("ab", "c") != singleflight.payload_key("a", "bc")
+    assert singleflight.payload_key("model", b"body") == singleflight.payload_key("model", "body")
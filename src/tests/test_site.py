@@ -0,0 +1,30 @@
+"""Cache headers of the static site routes."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from chatbot_common.chatbot import Chatbot # noqa: E402
+
+
+def test_only_hashed_image_variants_are_immutable(tmp_path):
+    img = tmp_path / "img"
+    (img / "variants").mkdir(parents=True)
+    for name in ("about.jpg", "variants/about-us-320.b3af9802.webp", "variants/manifest.json",
+                 "variants/about-320.jpg"):
+        (img / name).write_bytes(b"x")
+    bot = Chatbot({key: str(tmp_path / name) for key, name in (
+        ("DB_PATH", "bot.db"), ("CONVERSATIONS_FOLDER", "conversations"), ("CONTACTS_FOLDER", "contacts"),
+        ("IMAGE_FOLDER", "img"))})
+    client = bot.create_app().test_client()
+
+    def cache_control(path):
+        response = client.get(path)
+        assert response.status_code == 200
+        return response.cache_control
+
+    hashed = cache_control("/img/variants/about-us-320.b3af9802.webp")
+    assert hashed.immutable and hashed.max_age == bot.config["ASSET_MAX_AGE"]
+    for path in ("/img/about.jpg", "/img/variants/manifest.json", "/img/variants/about-320.jpg"):
+        headers = cache_control(path)
+        assert not headers.immutable and headers.max_age == bot.config["IMAGE_MAX_AGE"], path
+    assert client.get("/img/variants/missing-320.b3af9802.webp").status_code == 404
@@ -0,0 +1,494 @@
+"""
+Static asset build for the Qbytz site.
+
+Reads the HTML pages of the site, and for every page bundles the local
+stylesheets and scripts it references (in document order) into one CSS and
+one JS file. Bootstrap and theme rules whose classes, ids or elements never
+appear in the pages or scripts are dropped, the bundles are minified and
+written under content-hashed names with .gz (and .br, when the brotli
+package is installed) variants next to them, and the pages are rewritten
+to reference the bundles:
+
+    python tools/build_assets.py --site Qbytz_Bot --out Qbytz_Bot/dist
+    python tools/build_assets.py --site Qbytz_Bot --out Qbytz_Bot/dist --report build-report.json
+
+The output directory holds the rewritten pages, assets/ with the bundles
+and anything their url() references point at, and asset-manifest.json.
+When tools/build_images.py has been run, <img> tags are also rewritten to
+the responsive variants listed in img/variants/manifest.json, with sizes
+taken from image_sizes.json.
+The Qbytz bot serves it (SITE_FOLDER) with long-lived cache headers. The report
+compares bytes and requests per page before and after.
+"""
+import os
+import re
+import sys
+import json
+import gzip
+import shutil
+import hashlib
+import argparse
+
+import build_images
+
+try:
+    import brotli # type: ignore
+except ImportError:
+    brotli = None
+
+HASH_LENGTH = 10
+COMPRESSIBLE = (".css", ".js", ".html", ".svg", ".json")
+
+LINK_RE = re.compile(r"<link\b[^>]*>", re.IGNORECASE)
+SCRIPT_RE = re.compile(r"<script\b[^>]*\bsrc\s*=\s*[\"']([^\"']+)[\"'][^>]*>\s*</script>", re.IGNORECASE)
+HREF_RE = re.compile(r"\bhref\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE)
+STYLESHEET_RE = re.compile(r"\brel\s*=\s*[\"']?stylesheet", re.IGNORECASE)
+TOKEN_RE = re.compile(r"[A-Za-z0-9_-]+")
+CSS_URL_RE = re.compile(r"url\(\s*([\"']?)([^\"')]+)\1\s*\)")
+
+# Classes added at runtime by Bootstrap, Owl Carousel and jqBootstrapValidation,
+# so they never show up in the page source
+SAFELIST_PREFIXES = ("owl-", "carousel", "modal", "dropdown", "tooltip", "popover", "bs-", "collapse",
+                     "navbar", "was-validated", "is-valid", "is-invalid", "help-", "animated")
+SAFELIST = {"show", "showing", "fade", "active", "disabled", "focus", "in", "open", "error", "warning",
+            "success", "control-group", "fadeIn", "fadeOut"}
+
+
+# -------------------------------
+# CSS
+# -------------------------------
+def find_unquoted(text, start, chars):
+    """Index of the first of chars at or after start that is not inside quotes or parentheses."""
+    quote, depth = None, 0
+    for index in range(start, len(text)):
+        char = text[index]
+        if quote:
+            if char == "\\":
+                continue
+            if char == quote and text[index - 1] != "\\":
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(0, depth - 1)
+        elif depth == 0 and char in chars:
+            return index
+    return -1
+
+
+def matching_brace(text, open_index):
+    depth = 0
+    index = open_index
+    while index != -1:
+        if text[index] == "{":
+            depth += 1
+        elif text[index] == "}":
+            depth -= 1
+            if depth == 0:
+                return index
+        index = find_unquoted(text, index + 1, "{}")
+    return len(text)
+
+
+def parse_css(text):
+    """Parse into nodes: ("rule", selectors, body), ("block", prelude, children),
+    ("at", prelude, body) for other at-rule blocks and ("stmt", text) for @import and friends."""
+    nodes, index = [], 0
+    while True:
+        brace = find_unquoted(text, index, "{;}")
+        if brace == -1:
+            break
+        head = text[index:brace].strip()
+        if text[brace] != "{":
+            if head:
+                nodes.append(("stmt", head))
+            index = brace + 1
+            continue
+        end = matching_brace(text, brace)
+        body = text[brace + 1:end]
+        if head.startswith("@"):
+            name = head[1:].split(None, 1)[0].lower() if len(head) > 1 else ""
+            if name in ("media", "supports", "document"):
+                nodes.append(("block", head, parse_css(body)))
+            else:
+                nodes.append(("at", head, body))
+        else:
+            nodes.append(("rule", head, body))
+        index = end + 1
+    return nodes
+
+
+def split_selectors(selectors):
+    parts, start = [], 0
+    while True:
+        comma = find_unquoted(selectors, start, ",")
+        if comma == -1:
+            parts.append(selectors[start:].strip())
+            return [part for part in parts if part]
+        parts.append(selectors[start:comma].strip())
+        start = comma + 1
+
+
+def selector_used(selector, used):
+    """True if every class, id and element name in the selector is used somewhere."""
+    if "\\" in selector:
+        return True
+    plain = re.sub(r"\[[^\]]*\]", "", selector)
+    plain = re.sub(r"::?[\w-]+(\([^)]*\))?", "", plain)
+    names = re.findall(r"[.#](-?[_a-zA-Z][\w-]*)", plain)
+    elements = re.findall(r"(?:^|[\s>+~])([a-zA-Z][\w-]*)", plain)
+    for name in names:
+        if name not in used and name not in SAFELIST and not name.startswith(SAFELIST_PREFIXES):
+            return False
+    return all(element.lower() in used for element in elements)
+
+
+def purge_css(nodes, used):
+    kept = []
+    for node in nodes:
+        if node[0] == "rule":
+            selectors = [selector for selector in split_selectors(node[1]) if selector_used(selector, used)]
+            if selectors:
+                kept.append(("rule", ",".join(selectors), node[2]))
+        elif node[0] == "block":
+            children = purge_css(node[2], used)
+            if children:
+                kept.append(("block", node[1], children))
+        else:
+            kept.append(node)
+    return kept
+
+
+def squeeze(text):
+    """Collapse whitespace, dropping it around punctuation outside quotes and parentheses."""
+    text = re.sub(r"\s+", " ", text).strip()
+    out, quote, depth = [], None, 0
+    for index, char in enumerate(text):
+        if quote:
+            out.append(char)
+            if char == quote and text[index - 1] != "\\":
+                quote = None
+            continue
+        if char in "\"'":
+            quote = char
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth = max(0, depth - 1)
+        if char == " " and depth == 0:
+            before = out[-1] if out else ""
+            after = text[index + 1] if index + 1 < len(text) else ""
+            if before in ":;,{}>~" or after in ":;,{}>~!":
+                continue
+        out.append(char)
+    return "".join(out).rstrip(";")
+
+
+def squeeze_selector(selector):
+    # A space before ":" is a descendant combinator, so only touch combinators and commas
+    selector = re.sub(r"\s+", " ", selector).strip()
+    return re.sub(r"\s*([>+~,])\s*", r"\1", selector)
+
+
+def serialize_css(nodes):
+    out = []
+    for node in nodes:
+        if node[0] == "rule":
+            body = squeeze(node[2])
+            if body:
+                out.append(f"{squeeze_selector(node[1])}{{{body}}}")
+        elif node[0] == "block":
+            out.append(f"{squeeze(node[1])}{{{serialize_css(node[2])}}}")
+        elif node[0] == "at":
+            body = node[2]
+            inner = serialize_css(parse_css(body)) if "{" in body else squeeze(body)
+            out.append(f"{squeeze(node[1])}{{{inner}}}")
+        else:
+            out.append(squeeze(node[1]) + ";")
+    return "".join(out)
+
+
+def strip_css_comments(text):
+    return re.sub(r"/\*.*?\*/", "", text, flags=re.DOTALL)
+
+
+def minify_css(text, used=None):
+    nodes = parse_css(strip_css_comments(text))
+    if used is not None:
+        nodes = purge_css(nodes, used)
+    return serialize_css(nodes)
+
+
+# -------------------------------
+# JavaScript
+# -------------------------------
+REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+
+
+def minify_js(text):
+    """Conservative minifier: drops comments, indentation and blank lines.
+
+    Line breaks are kept so automatic semicolon insertion behaves exactly as
+    before; strings, template literals and regex literals are left alone.
+    """
+    out, index, length = [], 0, len(text)
+    last_significant = ""
+    while index < length:
+        char = text[index]
+        nxt = text[index + 1] if index + 1 < length else ""
+        if char in "\"'`":
+            end = index + 1
+            while end < length and text[end] != char:
+                end += 2 if text[end] == "\\" else 1
+            out.append(text[index:end + 1])
+            index = end + 1
+            last_significant = char
+        elif char == "/" and nxt == "/":
+            while index < length and text[index] != "\n":
+                index += 1
+        elif char == "/" and nxt == "*":
+            end = text.find("*/", index + 2)
+            index = length if end == -1 else end + 2
+            out.append(" ")
+        elif char == "/" and (last_significant in REGEX_PRECEDERS or last_significant == ""
+                              or re.search(r"\b(return|typeof|case|in|of)\s*$", "".join(out[-3:]))):
+            end, in_class = index + 1, False
+            while end < length and text[end] != "\n":
+                if text[end] == "\\":
+                    end += 2
+                    continue
+                if text[end] == "[":
+                    in_class = True
+                elif text[end] == "]":
+                    in_class = False
+                elif text[end] == "/" and not in_class:
+                    break
+                end += 1
+            out.append(text[index:end + 1])
+            index = end + 1
+            last_significant = "/"
+        else:
+            out.append(char)
+            if not char.isspace():
+                last_significant = char
+            index += 1
+    lines = (line.strip() for line in "".join(out).splitlines())
+    return "\n".join(line for line in lines if line) + "\n"
+
+
+# -------------------------------
+# Pages
+# -------------------------------
+def is_local(url):
+    return not re.match(r"^([a-z]+:)?//", url, re.IGNORECASE) and not url.startswith(("data:", "#"))
+
+
+def page_assets(html):
+    """Return ([(tag, url)] for local stylesheets, [(tag, url)] for local scripts) in document order."""
+    styles = []
+    for match in LINK_RE.finditer(html):
+        tag = match.group()
+        href = HREF_RE.search(tag)
+        if href and STYLESHEET_RE.search(tag) and is_local(href.group(1)):
+            styles.append((tag, href.group(1)))
+    scripts = [(match.group(), match.group(1)) for match in SCRIPT_RE.finditer(html) if is_local(match.group(1))]
+    return styles, scripts
+
+
+def used_tokens(site, pages, scripts):
+    """Every word that appears in a page or a local script, as PurgeCSS does."""
+    used = set()
+    for path in list(pages) + list(scripts):
+        with open(os.path.join(site, path), "r", encoding="utf-8", errors="replace") as f:
+            used.update(TOKEN_RE.findall(f.read()))
+    return used | {token.lower() for token in used}
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(name, data):
+    stem, ext = os.path.splitext(os.path.basename(name))
+    return f"{stem}.{content_hash(data)}{ext}"
+
+
+def write_with_variants(path, data):
+    """Write data plus precompressed variants; returns {encoding: bytes} sizes."""
+    with open(path, "wb") as f:
+        f.write(data)
+    sizes = {"identity": len(data)}
+    if not path.endswith(COMPRESSIBLE):
+        return sizes
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    with open(path + ".gz", "wb") as f:
+        f.write(gz)
+    sizes["gzip"] = len(gz)
+    if brotli is not None:
+        br = brotli.compress(data, quality=11)
+        with open(path + ".br", "wb") as f:
+            f.write(br)
+        sizes["br"] = len(br)
+    return sizes
+
+
+def transfer_sizes(data):
+    sizes = {"identity": len(data), "gzip": len(gzip.compress(data, compresslevel=9, mtime=0))}
+    if brotli is not None:
+        sizes["br"] = len(brotli.compress(data, quality=11))
+    return sizes
+
+
+class AssetBuilder:
+    def __init__(self, site, out):
+        self.site = os.path.abspath(site)
+        self.out = os.path.abspath(out)
+        self.images = build_images.load_manifest(
+            os.path.join(self.site, "img", build_images.VARIANTS_DIR, build_images.MANIFEST_NAME))
+        self.image_sizes = build_images.load_sizes(self.site)
+        self.assets_dir = os.path.join(self.out, "assets")
+        self.manifest = {}   # source path or bundle key -> hashed asset path
+        self.sizes = {}      # hashed asset path -> {encoding: bytes}
+        self._bundles = {}   # (kind, sources) -> hashed asset path
+
+    def read(self, path):
+        with open(os.path.join(self.site, path), "rb") as f:
+            return f.read()
+
+    def emit(self, name, data):
+        asset = "assets/" + hashed_name(name, data)
+        if asset not in self.sizes:
+            self.sizes[asset] = write_with_variants(os.path.join(self.out, asset), data)
+        return asset
+
+    def rebase_urls(self, css, source):
+        """Copy files referenced by url() into assets/ and point the CSS at the hashed copies."""
+        base = os.path.dirname(source)
+
+        def replace(match):
+            url = match.group(2).strip()
+            if not is_local(url) or url.startswith("/"):
+                return match.group()
+            path = os.path.normpath(os.path.join(base, url.split("?")[0].split("#")[0]))
+            if not os.path.isfile(os.path.join(self.site, path)):
+                return match.group()
+            asset = self.emit(path, self.read(path))
+            self.manifest[path.replace(os.sep, "/")] = asset
+            return f"url({os.path.basename(asset)})"
+
+        return CSS_URL_RE.sub(replace, css)
+
+    def bundle(self, kind, sources, used):
+        key = (kind, tuple(sources))
+        if key not in self._bundles:
+            parts = []
+            for source in sources:
+                text = self.read(source).decode("utf-8")
+                if kind == "css":
+                    parts.append(minify_css(self.rebase_urls(text, source), used))
+                elif ".min." in source:
+                    parts.append(text.strip() + "\n;")
+                else:
+                    parts.append(minify_js(text) + ";")
+            data = "\n".join(parts).encode("utf-8")
+            asset = self.emit(f"bundle.{kind}", data)
+            self.manifest["+".join(sources)] = asset
+            self._bundles[key] = asset
+        return self._bundles[key]
+
+    def build(self, pages):
+        if os.path.isdir(self.out):
+            shutil.rmtree(self.out)
+        os.makedirs(self.assets_dir)
+
+        parsed = {}
+        all_scripts = set()
+        for page in pages:
+            with open(os.path.join(self.site, page), "r", encoding="utf-8") as f:
+                html = f.read()
+            styles, scripts = page_assets(html)
+            styles = [(tag, url) for tag, url in styles if os.path.isfile(os.path.join(self.site, url))]
+            scripts = [(tag, url) for tag, url in scripts if os.path.isfile(os.path.join(self.site, url))]
+            parsed[page] = (html, styles, scripts)
+            all_scripts.update(url for _, url in scripts)
+        used = used_tokens(self.site, pages, sorted(all_scripts))
+
+        report = []
+        for page, (html, styles, scripts) in parsed.items():
+            before = {"requests": len(styles) + len(scripts), "bytes": {}}
+            for _, url in styles + scripts:
+                for encoding, size in transfer_sizes(self.read(url)).items():
+                    before["bytes"][encoding] = before["bytes"].get(encoding, 0) + size
+            after = {"requests": 0, "bytes": {}}
+
+            for kind, found in (("css", styles), ("js", scripts)):
+                if not found:
+                    continue
+                asset = self.bundle(kind, [url for _, url in found], used)
+                if kind == "css":
+                    replacement = f'<link href="{asset}" rel="stylesheet">'
+                else:
+                    replacement = f'<script src="{asset}"></script>'
+                # The bundle takes the place of the last tag so ordering against CDN files holds
+                for tag, _ in found[:-1]:
+                    html = re.sub(r"[ \t]*" + re.escape(tag) + r"[ \t]*\r?\n?", "", html, count=1)
+                html = html.replace(found[-1][0], replacement, 1)
+                after["requests"] += 1
+                for encoding, size in self.sizes[asset].items():
+                    after["bytes"][encoding] = after["bytes"].get(encoding, 0) + size
+
+            if self.images:
+                html = build_images.rewrite_img_tags(html, self.images, sizes_map=self.image_sizes)
+            write_with_variants(os.path.join(self.out, page), html.encode("utf-8"))
+            report.append({"page": page, "before": before, "after": after})
+
+        with open(os.path.join(self.out, "asset-manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=4, sort_keys=True)
+        return report
+
+
+def print_report(report):
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+    header = f"{'page':<22} {'requests':>10}" + "".join(f" {encoding + ' KB':>20}" for encoding in encodings)
+    print(header)
+    totals = {"before": {}, "after": {}}
+    for entry in report:
+        line = f"{entry['page']:<22} {entry['before']['requests']:>4} -> {entry['after']['requests']:<3}"
+        for encoding in encodings:
+            before = entry["before"]["bytes"].get(encoding, 0)
+            after = entry["after"]["bytes"].get(encoding, entry["after"]["bytes"].get("identity", 0))
+            line += f" {before / 1024:>8.1f} -> {after / 1024:<8.1f}"
+            totals["before"][encoding] = totals["before"].get(encoding, 0) + before
+            totals["after"][encoding] = totals["after"].get(encoding, 0) + after
+        print(line)
+    for encoding in encodings:
+        before, after = totals["before"].get(encoding, 0), totals["after"].get(encoding, 0)
+        saved = (1 - after / before) * 100 if before else 0.0
+        print(f"total {encoding:<9} {before / 1024:>10.1f} KB -> {after / 1024:.1f} KB ({saved:.1f}% less)")
+    if brotli is None:
+        print("brotli is not installed: no .br variants were written (pip install brotli)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bundle, purge, minify and hash the site's CSS/JS.")
+    parser.add_argument("--site", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                       "Qbytz_Bot"))
+    parser.add_argument("--out", default=None, help="output directory (default: <site>/dist)")
+    parser.add_argument("--report", help="also write the size report to this JSON file")
+    args = parser.parse_args()
+
+    out = args.out or os.path.join(args.site, "dist")
+    pages = sorted(name for name in os.listdir(args.site) if name.endswith(".html"))
+    if not pages:
+        sys.exit(f"no .html pages in {args.site}")
+    report = AssetBuilder(args.site, out).build(pages)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
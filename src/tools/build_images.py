@@ -0,0 +1,327 @@
+"""
+Responsive image variants for the Qbytz site.
+
+Every image in Qbytz_Bot/img is resized to a few widths (never upscaled)
+and encoded as AVIF, WebP and a JPEG fallback (PNG for images with real
+transparency). Images are processed in parallel, one per worker process,
+and a manifest keyed by content hash lets unchanged images be skipped on
+the next run:
+
+    python tools/build_images.py --site Qbytz_Bot
+    python tools/build_images.py --site Qbytz_Bot --workers 4 --viewport 800 --report images.json
+
+Variants land in img/variants/ as <name>-<width>.<hash>.<ext>, so they can
+be cached forever. tools/build_assets.py reads the manifest and rewrites
+the <img> tags of the built pages to <picture> elements with srcset and
+lazy loading (rewrite_img_tags below).
+
+The sizes attribute tells the browser how wide the image's layout slot is,
+so a card thumbnail doesn't download a variant meant for the full viewport.
+It comes from a sizes="..." already on the <img> tag, else from the first
+matching pattern in the site's image_sizes.json, else the image is assumed
+to span the viewport:
+
+    {"cat-*": "(min-width: 1200px) 255px, ..., calc(100vw - 30px)", "blog-80x80.jpg": "80px"}
+"""
+import os
+import re
+import io
+import sys
+import json
+import fnmatch
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, ImageOps # type: ignore
+
+WIDTHS = (320, 640, 960, 1280, 1920)
+SOURCE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+VARIANTS_DIR = "variants"
+MANIFEST_NAME = "manifest.json"
+SIZES_NAME = "image_sizes.json"
+# (format key, Pillow format, extension, MIME type, save options)
+FORMATS = (
+    ("avif", "AVIF", ".avif", "image/avif", {"quality": 50}),
+    ("webp", "WEBP", ".webp", "image/webp", {"quality": 75, "method": 6}),
+    ("jpeg", "JPEG", ".jpg", "image/jpeg", {"quality": 80, "optimize": True, "progressive": True}),
+)
+PNG_FALLBACK = ("png", "PNG", ".png", "image/png", {"optimize": True})
+MIME_TYPES = {key: mime for key, _, _, mime, _ in FORMATS + (PNG_FALLBACK,)}
+
+IMG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+SRC_RE = re.compile(r"\bsrc\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE)
+SIZES_RE = re.compile(r"\s+sizes\s*=\s*[\"']([^\"']*)[\"']", re.IGNORECASE)
+
+
+def settings_key():
+    """Changes whenever the widths or encoder settings do, so old variants get rebuilt."""
+    # "exif_transpose": variants built before EXIF orientation was applied are rebuilt
+    return hashlib.sha256(repr((WIDTHS, FORMATS, PNG_FALLBACK, "exif_transpose")).encode()).hexdigest()[:10]
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def has_transparency(image):
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        return image.convert("RGBA").getchannel("A").getextrema()[0] < 255
+    return False
+
+
+def target_widths(width):
+    return sorted({w for w in WIDTHS if w < width} | {min(width, WIDTHS[-1])})
+
+
+def build_variants(task):
+    """Worker: encode every width/format of one image; returns its manifest entry."""
+    source, out_dir, digest = task
+    with open(source, "rb") as f:
+        original = f.read()
+    image = Image.open(io.BytesIO(original))
+    source_format = image.format
+    image.load()
+    # Encoders drop the EXIF orientation, so rotated photos must be turned upright first
+    upright = image.getexif().get(0x0112, 1) in (0, 1)
+    if not upright:
+        image = ImageOps.exif_transpose(image)
+    transparent = has_transparency(image)
+    image = image.convert("RGBA" if transparent else "RGB")
+    stem = os.path.splitext(os.path.basename(source))[0]
+    formats = FORMATS[:2] + (PNG_FALLBACK,) if transparent else FORMATS
+
+    variants = {key: [] for key, _, _, _, _ in formats}
+    for width in target_widths(image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for key, pil_format, extension, _, options in formats:
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, **options)
+            data = buffer.getvalue()
+            # Re-encoding an already compressed original at full size can make it bigger
+            if resized is image and upright and pil_format == source_format and len(original) < len(data):
+                data = original
+            name = f"{stem}-{width}.{digest[:8]}{extension}"
+            with open(os.path.join(out_dir, name), "wb") as f:
+                f.write(data)
+            variants[key].append({"width": width, "file": name, "bytes": len(data)})
+
+    # A narrower variant that is heavier than a wider one is never worth sending
+    for key, found in variants.items():
+        kept, lightest = [], None
+        for variant in reversed(found):
+            if lightest is not None and variant["bytes"] >= lightest:
+                os.remove(os.path.join(out_dir, variant["file"]))
+                continue
+            kept.append(variant)
+            lightest = variant["bytes"]
+        variants[key] = kept[::-1]
+    return {
+        "hash": digest,
+        "settings": settings_key(),
+        "width": image.width,
+        "height": image.height,
+        "bytes": len(original),
+        "fallback": formats[-1][0],
+        "variants": variants,
+    }
+
+
+def load_manifest(path):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+def is_current(entry, digest, out_dir):
+    if not entry or entry.get("hash") != digest or entry.get("settings") != settings_key():
+        return False
+    return all(os.path.exists(os.path.join(out_dir, variant["file"]))
+               for variants in entry["variants"].values() for variant in variants)
+
+
+def remove_variants(entry, out_dir):
+    for variants in entry.get("variants", {}).values():
+        for variant in variants:
+            path = os.path.join(out_dir, variant["file"])
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def build(img_dir, workers=None):
+    """Bring img/variants up to date; returns (manifest, names that were rebuilt)."""
+    out_dir = os.path.join(img_dir, VARIANTS_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+
+    sources = sorted(name for name in os.listdir(img_dir) if name.lower().endswith(SOURCE_EXTENSIONS))
+    for name in set(manifest) - set(sources):
+        remove_variants(manifest.pop(name), out_dir)
+
+    tasks = {}
+    for name in sources:
+        digest = file_hash(os.path.join(img_dir, name))
+        if not is_current(manifest.get(name), digest, out_dir):
+            remove_variants(manifest.get(name, {}), out_dir)
+            tasks[name] = (os.path.join(img_dir, name), out_dir, digest)
+
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for name, entry in zip(tasks, pool.map(build_variants, tasks.values())):
+                manifest[name] = entry
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    return manifest, sorted(tasks)
+
+
+# -------------------------------
+# HTML
+# -------------------------------
+def load_sizes(site):
+    """Return the site's {image name pattern: sizes} map, or {} without image_sizes.json."""
+    return load_manifest(os.path.join(site, SIZES_NAME))
+
+
+def slot_sizes(name, entry, sizes_map):
+    for pattern, sizes in sizes_map.items():
+        if fnmatch.fnmatch(name, pattern):
+            return sizes
+    largest = entry["variants"][entry["fallback"]][-1]
+    return f"(max-width: {largest['width']}px) 100vw, {largest['width']}px"
+
+
+def srcset(variants, prefix):
+    return ", ".join(f"{prefix}{variant['file']} {variant['width']}w" for variant in variants)
+
+
+def picture_tag(tag, entry, prefix, lazy, sizes):
+    """Wrap one <img> tag in a <picture> offering the modern formats first."""
+    largest = entry["variants"][entry["fallback"]][-1]
+    sources = "".join(
+        f'<source type="{MIME_TYPES[key]}" srcset="{srcset(variants, prefix)}" sizes="{sizes}">'
+        for key, variants in entry["variants"].items() if key != entry["fallback"])
+
+    img = SRC_RE.sub(lambda _: f'src="{prefix}{largest["file"]}"', tag, count=1)
+    extra = f' srcset="{srcset(entry["variants"][entry["fallback"]], prefix)}" sizes="{sizes}"'
+    if lazy and "loading=" not in tag.lower():
+        extra += ' loading="lazy"'
+    if "decoding=" not in tag.lower():
+        extra += ' decoding="async"'
+    img = re.sub(r"\s*/?>$", lambda end: extra + end.group(), img)
+    # display: contents keeps the <img> laid out exactly as before inside flex and grid parents
+    return f'<picture style="display: contents">{sources}{img}</picture>'
+
+
+def rewrite_img_tags(html, manifest, eager=1, sizes_map=None):
+    """Rewrite local img/ references found in manifest; the first eager images are not lazy-loaded."""
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        tag = match.group()
+        src = SRC_RE.search(tag)
+        if not src or "srcset" in tag.lower():
+            return tag
+        path = src.group(1)
+        if not path.startswith("img/") or path[4:] not in manifest:
+            return tag
+        count += 1
+        # A sizes attribute written on the tag describes this particular slot
+        own_sizes = SIZES_RE.search(tag)
+        if own_sizes:
+            tag = SIZES_RE.sub("", tag, count=1)
+            sizes = own_sizes.group(1)
+        else:
+            sizes = slot_sizes(path[4:], manifest[path[4:]], sizes_map or {})
+        return picture_tag(tag, manifest[path[4:]], f"img/{VARIANTS_DIR}/", lazy=count > eager, sizes=sizes)
+
+    return IMG_RE.sub(replace, html)
+
+
+# -------------------------------
+# Report
+# -------------------------------
+def css_length(length, viewport):
+    """Evaluate a px / vw length or a calc() of them, as used in sizes."""
+    total = 0.0
+    for sign, value, unit in re.findall(r"([+-]?)\s*(\d+(?:\.\d+)?)(px|vw)", length):
+        value = float(value) * (viewport / 100.0 if unit == "vw" else 1.0)
+        total += -value if sign == "-" else value
+    return total
+
+
+def slot_width(sizes, viewport):
+    """Width in CSS pixels that a sizes attribute gives the image at this viewport width."""
+    for candidate in sizes.split(","):
+        condition = re.match(r"\s*\((min|max)-width:\s*(\d+)px\)\s*(.*)", candidate)
+        if condition is None:
+            return css_length(candidate, viewport)
+        bound, width, length = condition.groups()
+        if (viewport >= int(width)) if bound == "min" else (viewport <= int(width)):
+            return css_length(length, viewport)
+    return float(viewport)
+
+
+def served_variant(variants, width):
+    """The variant a browser picks for a slot of width CSS pixels (1x)."""
+    for variant in variants:
+        if variant["width"] >= width:
+            return variant
+    return variants[-1]
+
+
+def size_report(manifest, viewport, sizes_map=None):
+    rows = []
+    for name, entry in sorted(manifest.items()):
+        width = slot_width(slot_sizes(name, entry, sizes_map or {}), viewport)
+        row = {"image": name, "original": entry["bytes"], "slot": round(width)}
+        for key, variants in entry["variants"].items():
+            row[key] = served_variant(variants, width)["bytes"]
+        rows.append(row)
+    return rows
+
+
+def print_report(rows, viewport, rebuilt):
+    print(f"rebuilt {len(rebuilt)} image(s); sizes for a {viewport}px viewport")
+    print(f"{'image':<22} {'slot px':>8} {'original KB':>12} {'avif KB':>9} {'webp KB':>9} {'fallback KB':>12}")
+    totals = {"original": 0, "avif": 0, "webp": 0, "fallback": 0}
+    for row in rows:
+        fallback = row.get("jpeg", row.get("png", 0))
+        print(f"{row['image']:<22} {row['slot']:>8} {row['original'] / 1024:>12.1f} {row['avif'] / 1024:>9.1f} "
+              f"{row['webp'] / 1024:>9.1f} {fallback / 1024:>12.1f}")
+        for key, value in (("original", row["original"]), ("avif", row["avif"]), ("webp", row["webp"]),
+                           ("fallback", fallback)):
+            totals[key] += value
+    for key in ("avif", "webp", "fallback"):
+        saved = totals["original"] - totals[key]
+        print(f"total {key:<9} {totals['original'] / 1024:>10.1f} KB -> {totals[key] / 1024:.1f} KB "
+              f"({saved / 1024:.1f} KB saved, {saved / max(1, totals['original']) * 100:.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate responsive AVIF/WebP/JPEG image variants.")
+    parser.add_argument("--site", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                       "Qbytz_Bot"))
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--viewport", type=int, default=1280, help="viewport width used for the report")
+    parser.add_argument("--report", help="also write the size report to this JSON file")
+    args = parser.parse_args()
+
+    img_dir = os.path.join(args.site, "img")
+    if not os.path.isdir(img_dir):
+        sys.exit(f"no img folder in {args.site}")
+    manifest, rebuilt = build(img_dir, args.workers)
+    rows = size_report(manifest, args.viewport, load_sizes(args.site))
+    print_report(rows, args.viewport, rebuilt)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"viewport": args.viewport, "rebuilt": rebuilt, "images": rows}, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
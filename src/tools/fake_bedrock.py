@@ -0,0 +1,310 @@
+"""
+Offline stand-in for the bedrock-runtime InvokeModel API.
+
+Run it next to the apps and point them at it with BEDROCK_ENDPOINT_URL
+(environment variable or secrets.json key):
+
+    python tools/fake_bedrock.py --port 8900 --latency lognormal:-0.7,0.5 --throttle-rate 0.05
+    BEDROCK_ENDPOINT_URL=http://127.0.0.1:8900 python app.py
+
+Latency specs (seconds): fixed:S, uniform:LO,HI, normal:MEAN,STD,
+lognormal:MU,SIGMA (parameters of the underlying normal distribution).
+The behaviour can be changed at runtime with POST /_fake/config and the
+request counters read from GET /_fake/stats.
+"""
+import re
+import json
+import time
+import zlib
+import base64
+import random
+import struct
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import unquote
+
+CHAT_REPLIES = [
+    "Hello! Could you please share your Name and Mobile Number so I can assist you further?",
+    "Thanks! We build AI chatbots, document analysis and automation solutions for businesses.",
+    "Our team can help with custom AI integrations. Would you like our sales contact?",
+    "I am a helpful assistant, please ask me something else.",
+]
+
+LEAD_REPLY = {"name": "Test User", "phone": "9876543210", "email": "test@example.com",
+              "pain_points": "Wants faster customer support"}
+
+
+# -------------------------------
+# Configuration
+# -------------------------------
+def parse_latency(spec):
+    """Turn a latency spec such as "uniform:0.2,1.5" into a sampler."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class FakeConfig:
+    def __init__(self, latency="fixed:0.05", throttle_rate=0.0, error_rate=0.0,
+                 chunk_delay=0.02, chunk_words=3):
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "streams": 0, "throttled": 0, "errors": 0}
+        self.update(latency=latency, throttle_rate=throttle_rate, error_rate=error_rate,
+                    chunk_delay=chunk_delay, chunk_words=chunk_words)
+
+    def update(self, **values):
+        with self.lock:
+            if values.get("latency") is not None:
+                self.latency_spec = values["latency"]
+                self.sample_latency = parse_latency(values["latency"])
+            for key in ("throttle_rate", "error_rate", "chunk_delay"):
+                if values.get(key) is not None:
+                    setattr(self, key, float(values[key]))
+            if values.get("chunk_words") is not None:
+                self.chunk_words = int(values["chunk_words"])
+
+    def as_dict(self):
+        return {
+            "latency": self.latency_spec,
+            "throttle_rate": self.throttle_rate,
+            "error_rate": self.error_rate,
+            "chunk_delay": self.chunk_delay,
+            "chunk_words": self.chunk_words,
+        }
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+
+# -------------------------------
+# Responses
+# -------------------------------
+def batch_ids(payload):
+    """Conversation ids of a batched extraction request, or None for a single one."""
+    try:
+        messages = payload["messages"]
+        # The apps send their message list JSON-encoded inside one user message,
+        # possibly followed by an assistant prefill
+        if messages[0]["role"] == "user" and isinstance(messages[0].get("content"), str):
+            try:
+                messages = json.loads(messages[0]["content"])
+            except ValueError:
+                pass
+        content = messages[-1]["content"]
+        items = json.loads(content[content.index("["):])
+        return [item["id"] for item in items]
+    except (KeyError, IndexError, TypeError, ValueError, AttributeError):
+        return None
+
+
+def build_reply(payload):
+    """Return lead JSON for extraction prompts and a canned chat reply otherwise."""
+    prompt = json.dumps(payload.get("messages", []))
+    if "JSON" in prompt and "pain_points" in prompt:
+        ids = batch_ids(payload) if "JSON array" in prompt else None
+        if ids is not None:
+            return json.dumps([dict(LEAD_REPLY, id=conversation_id) for conversation_id in ids])
+        return json.dumps(LEAD_REPLY)
+    return random.choice(CHAT_REPLIES)
+
+
+def finish_reply(payload, text):
+    """Apply prefill, stop_sequences and max_tokens like the real API; returns (text, stop_reason, stop_sequence)."""
+    messages = payload.get("messages") or [{}]
+    prefill = messages[-1].get("content") if messages[-1].get("role") == "assistant" else None
+    if isinstance(prefill, str) and text.startswith(prefill):
+        text = text[len(prefill):]
+    stops = [(text.find(stop), stop) for stop in payload.get("stop_sequences") or [] if stop in text]
+    if stops:
+        index, stop = min(stops)
+        return text[:index], "stop_sequence", stop
+    limit = payload.get("max_tokens")
+    if limit and len(text) > limit * 4:  # same 4 characters per token as usage_for
+        return text[:limit * 4], "max_tokens", None
+    return text, "end_turn", None
+
+
+def usage_for(body, text):
+    return {"input_tokens": max(1, len(body) // 4), "output_tokens": max(1, len(text) // 4)}
+
+
+def encode_event(payload_bytes, headers):
+    """Encode one message in the AWS event-stream binary framing."""
+    header_bytes = b""
+    for name, value in headers.items():
+        name_bytes = name.encode("utf-8")
+        value_bytes = value.encode("utf-8")
+        header_bytes += struct.pack("B", len(name_bytes)) + name_bytes
+        header_bytes += struct.pack(">BH", 7, len(value_bytes)) + value_bytes
+    total_length = 12 + len(header_bytes) + len(payload_bytes) + 4
+    prelude = struct.pack(">II", total_length, len(header_bytes))
+    prelude += struct.pack(">I", zlib.crc32(prelude) & 0xFFFFFFFF)
+    message = prelude + header_bytes + payload_bytes
+    return message + struct.pack(">I", zlib.crc32(message) & 0xFFFFFFFF)
+
+
+def encode_chunk(event):
+    data = base64.b64encode(json.dumps(event).encode("utf-8")).decode("ascii")
+    return encode_event(json.dumps({"bytes": data}).encode("utf-8"), {
+        ":event-type": "chunk",
+        ":content-type": "application/json",
+        ":message-type": "event",
+    })
+
+
+def stream_events(text, usage, chunk_words, stop_reason="end_turn", stop_sequence=None):
+    yield {"type": "message_start", "message": {
+        "id": "msg_fake", "type": "message", "role": "assistant", "content": [],
+        "usage": {"input_tokens": usage["input_tokens"], "output_tokens": 0}}}
+    yield {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}
+    words = text.split(" ")
+    for start in range(0, len(words), chunk_words):
+        piece = " ".join(words[start:start + chunk_words])
+        if start + chunk_words < len(words):
+            piece += " "
+        yield {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}}
+    yield {"type": "content_block_stop", "index": 0}
+    yield {"type": "message_delta", "delta": {"stop_reason": stop_reason, "stop_sequence": stop_sequence},
+           "usage": {"output_tokens": usage["output_tokens"]}}
+    yield {"type": "message_stop", "amazon-bedrock-invocationMetrics": {
+        "inputTokenCount": usage["input_tokens"], "outputTokenCount": usage["output_tokens"]}}
+
+
+# -------------------------------
+# HTTP Handler
+# -------------------------------
+class FakeBedrockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None  # set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def do_GET(self):
+        if self.path == "/_fake/config":
+            return self._send_json(200, self.config.as_dict())
+        if self.path == "/_fake/stats":
+            return self._send_json(200, dict(self.config.stats))
+        self._send_json(404, {"message": "Not found"})
+
+    def do_POST(self):
+        body = self._read_body()
+        if self.path == "/_fake/config":
+            try:
+                self.config.update(**json.loads(body or b"{}"))
+            except (ValueError, TypeError, IndexError) as e:
+                return self._send_json(400, {"message": str(e)})
+            return self._send_json(200, self.config.as_dict())
+
+        match = re.fullmatch(r"/model/(.+)/(invoke|invoke-with-response-stream)", self.path)
+        if not match:
+            return self._send_json(404, {"message": "Unknown operation"})
+        model_id, operation = unquote(match.group(1)), match.group(2)
+
+        self.config.count("requests")
+        time.sleep(self.config.sample_latency())
+
+        roll = random.random()
+        if roll < self.config.throttle_rate:
+            self.config.count("throttled")
+            return self._send_json(429, {"message": "Too many requests, please wait before trying again."},
+                                   {"x-amzn-ErrorType": "ThrottlingException:"})
+        if roll < self.config.throttle_rate + self.config.error_rate:
+            self.config.count("errors")
+            return self._send_json(500, {"message": "Injected internal failure."},
+                                   {"x-amzn-ErrorType": "InternalServerException:"})
+
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return self._send_json(400, {"message": "Malformed input request"},
+                                   {"x-amzn-ErrorType": "ValidationException:"})
+        text, stop_reason, stop_sequence = finish_reply(payload, build_reply(payload))
+        usage = usage_for(body, text)
+
+        if operation == "invoke":
+            return self._send_json(200, {
+                "id": "msg_fake", "type": "message", "role": "assistant", "model": model_id,
+                "content": [{"type": "text", "text": text}],
+                "stop_reason": stop_reason, "stop_sequence": stop_sequence, "usage": usage,
+            }, {
+                "X-Amzn-Bedrock-Input-Token-Count": str(usage["input_tokens"]),
+                "X-Amzn-Bedrock-Output-Token-Count": str(usage["output_tokens"]),
+            })
+
+        self.config.count("streams")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+        self.send_header("X-Amzn-Bedrock-Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for event in stream_events(text, usage, self.config.chunk_words, stop_reason, stop_sequence):
+            frame = encode_chunk(event)
+            self.wfile.write(f"{len(frame):X}\r\n".encode("ascii") + frame + b"\r\n")
+            self.wfile.flush()
+            time.sleep(self.config.chunk_delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def make_server(host="127.0.0.1", port=8900, **config):
+    handler = type("ConfiguredFakeBedrockHandler", (FakeBedrockHandler,),
+                   {"config": FakeConfig(**config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(host="127.0.0.1", port=0, **config):
+    """Start a fake server in a daemon thread and return (server, endpoint_url)."""
+    server = make_server(host, port, **config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake bedrock-runtime server for offline testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", default="fixed:0.05", help="latency distribution spec")
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="seconds between stream chunks")
+    parser.add_argument("--chunk-words", type=int, default=3)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, latency=args.latency,
+                         throttle_rate=args.throttle_rate, error_rate=args.error_rate,
+                         chunk_delay=args.chunk_delay, chunk_words=args.chunk_words)
+    print(f"Fake Bedrock listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
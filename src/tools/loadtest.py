@@ -0,0 +1,184 @@
+"""
+End-to-end load generator for the /chat endpoint.
+
+Each virtual user plays a realistic multi-turn session (greeting, contact
+details, a few product questions) and keeps its session_id between turns.
+
+    python tools/loadtest.py --url http://127.0.0.1:5000/chat --users 20 --sessions 200
+    python tools/loadtest.py --url http://127.0.0.1:5000/chat --duration 60 --json results.json
+
+Reports p50/p95/p99 latency, throughput and error rate, overall and per turn.
+"""
+import json
+import time
+import random
+import argparse
+import threading
+import http.client
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+
+FIRST_NAMES = ["Asha", "Rahul", "Priya", "Vikram", "Neha", "Arjun", "Sara", "Kiran"]
+
+OPENERS = ["hi", "Hello", "hey there", "what do you do?", "Hi, I need some help"]
+
+QUESTIONS = [
+    "What services does your company offer?",
+    "Do you build custom chatbots?",
+    "How much does a typical project cost?",
+    "Can you integrate with our existing CRM?",
+    "What industries do you work with?",
+    "How long does implementation usually take?",
+    "Can I get your sales contact?",
+    "Do you offer training courses?",
+]
+
+
+def build_session(rng, question_turns):
+    """Return the list of user messages for one scripted session."""
+    name = rng.choice(FIRST_NAMES)
+    phone = "9" + "".join(rng.choice("0123456789") for _ in range(9))
+    turns = [rng.choice(OPENERS), f"My name is {name} and my number is {phone}"]
+    turns += rng.sample(QUESTIONS, min(question_turns, len(QUESTIONS)))
+    return turns
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1) if ordered else 0.0,
+    }
+
+
+class LoadTest:
+    def __init__(self, url, timeout=60.0, think_time=0.0, question_turns=3, seed=None):
+        self.url = url
+        self.timeout = timeout
+        self.think_time = think_time
+        self.question_turns = question_turns
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+        self.per_turn = {}
+        self.error_samples = []
+
+    def _record(self, turn, latency, error=None):
+        with self.lock:
+            bucket = self.per_turn.setdefault(turn, {"latencies": [], "errors": 0})
+            if error is None:
+                self.latencies.append(latency)
+                bucket["latencies"].append(latency)
+            else:
+                self.errors += 1
+                bucket["errors"] += 1
+                if len(self.error_samples) < 10:
+                    self.error_samples.append(error)
+
+    def post(self, message, session_id):
+        data = {"user_query": message}
+        if session_id:
+            data["session_id"] = session_id
+        req = urllib.request.Request(self.url, data=json.dumps(data).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def run_session(self, deadline=None):
+        with self.lock:
+            turns = build_session(self.rng, self.question_turns)
+        session_id = None
+        for turn, message in enumerate(turns):
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            start = time.perf_counter()
+            try:
+                body = self.post(message, session_id)
+                if "reply" not in body:
+                    raise ValueError(f"Unexpected response: {body}")
+                session_id = body.get("session_id") or session_id
+                self._record(turn, time.perf_counter() - start)
+            except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError) as e:
+                self._record(turn, time.perf_counter() - start, error=str(e))
+            if self.think_time:
+                time.sleep(self.think_time)
+
+    def run(self, users, sessions=None, duration=None):
+        deadline = time.monotonic() + duration if duration else None
+        started = time.perf_counter()
+
+        def worker(_):
+            if deadline is None:
+                return self.run_session()
+            while time.monotonic() < deadline:
+                self.run_session(deadline)
+
+        with ThreadPoolExecutor(max_workers=users) as pool:
+            count = sessions if deadline is None else users
+            list(pool.map(worker, range(count)))
+        elapsed = time.perf_counter() - started
+
+        report = summarize(self.latencies, self.errors, elapsed)
+        report["elapsed_s"] = round(elapsed, 2)
+        report["users"] = users
+        report["per_turn"] = {
+            str(turn): summarize(bucket["latencies"], bucket["errors"], elapsed)
+            for turn, bucket in sorted(self.per_turn.items())
+        }
+        report["error_samples"] = self.error_samples
+        return report
+
+
+def print_report(report):
+    print(f"Requests: {report['requests']}  errors: {report['errors']} "
+          f"({report['error_rate'] * 100:.2f}%)  elapsed: {report['elapsed_s']}s")
+    print(f"Throughput: {report['throughput_rps']} req/s with {report['users']} users")
+    print(f"Latency ms  p50={report['p50_ms']}  p95={report['p95_ms']}  "
+          f"p99={report['p99_ms']}  max={report['max_ms']}")
+    for turn, stats in report["per_turn"].items():
+        print(f"  turn {turn}: n={stats['requests']} p50={stats['p50_ms']} "
+              f"p95={stats['p95_ms']} p99={stats['p99_ms']} errors={stats['errors']}")
+    for sample in report["error_samples"]:
+        print(f"  error: {sample}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive /chat with multi-turn sessions.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/chat")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--sessions", type=int, default=50, help="sessions to run (ignored with --duration)")
+    parser.add_argument("--duration", type=float, default=None, help="run for N seconds instead")
+    parser.add_argument("--questions", type=int, default=3, help="product questions per session")
+    parser.add_argument("--think-time", type=float, default=0.0, help="pause between turns in seconds")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    args = parser.parse_args()
+
+    test = LoadTest(args.url, timeout=args.timeout, think_time=args.think_time,
+                    question_turns=args.questions, seed=args.seed)
+    report = test.run(args.users, sessions=args.sessions, duration=args.duration)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()